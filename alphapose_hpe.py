@@ -1,7 +1,13 @@
 import os
+import time
+from collections import namedtuple
+from contextlib import ExitStack
 import numpy as np
 import torch
 from base_hpe import BaseHPE, Body, Padding
+from utils.result_cache import file_fingerprint
+from utils.weights_cache import is_cache_valid
+from utils.openvino_settings import OpenVINOSettings, log_runtime_settings
 from types import SimpleNamespace
 
 try:
@@ -9,6 +15,7 @@ try:
 	from models.AlphaPose.alphapose.models import builder
 	from models.AlphaPose.alphapose.utils.config import update_config
 	from models.AlphaPose.alphapose.utils.detector import DetectionLoader
+	from models.AlphaPose.alphapose.utils.pPose_nms import pose_nms_body_batched
 	from models.AlphaPose.alphapose.utils.transforms import flip, flip_heatmap, get_func_heatmap_to_coord
 	from models.AlphaPose.alphapose.utils.vis import getTime
 	from models.AlphaPose.alphapose.utils.webcam_detector import WebCamDetectionLoader
@@ -18,12 +25,29 @@ except ImportError as e:
 
 DEFAULT_CFG        = "models/AlphaPose/pretrained_models/256x192_res50_lr1e-3_1x.yaml"
 DEFAULT_CHECKPOINT = "models/AlphaPose/pretrained_models/fast_res50_256x192.pth"
+# Memory-mappable copy of the checkpoint written by dev_tools/build_alphapose_weights_cache.py
+DEFAULT_CHECKPOINT_CACHE = "models/AlphaPose/pretrained_models/fast_res50_256x192.cache.pt"
+# OpenVINO IR written by dev_tools/export_alphapose_openvino.py
+DEFAULT_POSE_IR     = "models/AlphaPose/pretrained_models/fast_res50_256x192.xml"
+DEFAULT_DETECTOR_IR = "models/AlphaPose/detector/yolo/data/yolov3-spp.xml"
+
+BACKENDS = ("torch", "openvino")
+
+# Output of run_model(), normalized to [0,1] like the keypoints:
+# keypoints: per person a (17, 3) array of x, y, score
+# boxes:     (n, 5) array of the detector boxes x1, y1, x2, y2 and their scores
+PosePredictions = namedtuple('PosePredictions', ['keypoints', 'boxes'])
+NO_POSES = PosePredictions([], np.zeros((0, 5)))
 
 # Note: current input handles max 1 gpu - so no option fo gpus = "0,1" for example
-DEVICE_TO_GPU = {
-            "GPU": "0",
-            "CPU": "-1"
-        }
+def torch_gpus(device):
+    """CUDA device of --device for the torch backend: CPU -> "-1", GPU -> "0", GPU.n -> "n", otherwise None."""
+    name, _, index = device.upper().partition(".")
+    if name == "CPU" and not index:
+        return "-1"
+    if name == "GPU" and (not index or index.isdigit()):
+        return index or "0"
+    return None
 
 class AlphaPoseHPE(BaseHPE):
     LINES_BODY = [ 
@@ -34,19 +58,64 @@ class AlphaPoseHPE(BaseHPE):
     ]
 
     def __init__(self, cfg = DEFAULT_CFG, device = "GPU", detbatch = 1, posebatch = 32, detector = "yolo", 
-                 checkpoint = DEFAULT_CHECKPOINT, sp = True, *args, **kwargs):
-        gpus = DEVICE_TO_GPU.get(device, "-1")
+                 checkpoint = DEFAULT_CHECKPOINT, checkpoint_cache = DEFAULT_CHECKPOINT_CACHE, sp = True, torch_threads = None, inference_mode = False,
+                 channels_last = False, bf16 = False, compile_model = False, backend = "torch",
+                 pose_ir = DEFAULT_POSE_IR, detector_ir = DEFAULT_DETECTOR_IR, performance_hint = None, num_streams = None,
+                 num_threads = None, infer_requests = 0, pose_nms = False, *args, **kwargs):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unsupported AlphaPose backend: {backend}. Choose from: {list(BACKENDS)}")
+        if backend == "openvino" and detector != "yolo":
+            raise ValueError("The OpenVINO backend only supports the yolo detector")
+        if kwargs.get("frame_source") is not None:
+            # The detection loaders of load_model() open and decode the input themselves
+            raise ValueError("AlphaPose cannot run on the frames of the fan-out process (--methods)")
+
+        gpus = torch_gpus(device)
+        if gpus is None:
+            if backend == "torch":
+                raise ValueError(f"Unsupported device for the torch backend of AlphaPose: {device}. "
+                                 "Use CPU, GPU or GPU.n (CUDA device n), or --alphapose_backend openvino")
+            gpus = "-1"   # the OpenVINO backend runs both models on the OpenVINO device
         self.cfg = cfg
+        self.cfg_file = cfg
         self.gpus = [int(i) for i in gpus.split(',')] if torch.cuda.device_count() >= 1 else [-1]
         self.device = torch.device("cuda:" + str(self.gpus[0]) if self.gpus[0] >= 0 else "cpu")
         self.detbatch = detbatch * len(self.gpus)
         self.posebatch = posebatch * len(self.gpus)
         self.detector = detector
         self.checkpoint = checkpoint
+        self.checkpoint_cache = checkpoint_cache
         self.sp = sp
 
+        self.backend = backend
+        self.pose_ir = pose_ir
+        self.detector_ir = detector_ir
+        self.ov_device = device
+        # OpenVINO backend: both models run one synchronous request, infer_requests does not apply
+        self.ov_settings = OpenVINOSettings(device, performance_hint, num_streams, num_threads, infer_requests) if backend == "openvino" else None
+
+        # Parametric pose NMS over the poses of overlapping detections, see postprocess()
+        self.pose_nms = pose_nms
+
+        # CPU performance options for the torch path
+        self.inference_mode = inference_mode
+        self.channels_last = channels_last
+        self.bf16 = bf16
+        self.compile_model = compile_model
+
         self.model_type = "alphapose"
-        print(f"[INFO] Running AlphaPose on {self.device}")
+        if self.backend == "openvino":
+            print(f"[INFO] Running AlphaPose with OpenVINO: {self.ov_settings}")
+        else:
+            print(f"[INFO] Running AlphaPose on {self.device}")
+
+        if torch_threads:
+            torch.set_num_threads(torch_threads)
+        print(f"[INFO] torch intra-op threads: {torch.get_num_threads()}")
+
+        if self.bf16 and not bf16_supported(self.device):
+            print("[INFO] bf16 autocast is not supported on this CPU. Falling back to fp32.")
+            self.bf16 = False
 
         if not self.sp:
             torch.multiprocessing.set_start_method('forkserver', force=True)
@@ -90,25 +159,101 @@ class AlphaPoseHPE(BaseHPE):
             self.det_loader = DetectionLoader([self.input_src], self.cap, get_detector(opt1), self.cfg, opt2, batchSize=self.detbatch, mode=self.input_type, queueSize=qsize)
             det_worker = self.det_loader.start()
 
+        self.pose_dataset = builder.retrieve_dataset(self.cfg.DATASET.TRAIN)
+
+        self.runtime_profile = {
+            'dt': [],
+            'pt': [],
+            'pn': []
+        }
+
+        if self.backend == "openvino":
+            # Both stages run through OpenVINO, box/crop/decode logic stays the same
+            print('Loading pose model from %s...' % (self.pose_ir,))
+            self.pose_model = OpenVINOModel(self.pose_ir, self.ov_settings)
+            print('Loading detector from %s...' % (self.detector_ir,))
+            self.det_loader.detector.model = OpenVINOModel(self.detector_ir, self.ov_settings)
+            return
+
         # Load pose model
         self.pose_model = builder.build_sppe(self.cfg.MODEL, preset_cfg=self.cfg.DATA_PRESET)
 
-        print('Loading pose model from %s...' % (self.checkpoint,))
-        self.pose_model.load_state_dict(torch.load(self.checkpoint, map_location=self.device))
-        self.pose_dataset = builder.retrieve_dataset(self.cfg.DATASET.TRAIN)
+        start = time.perf_counter()
+        if is_cache_valid(self.checkpoint_cache, self.checkpoint):
+            print('Loading pose model from %s...' % (self.checkpoint_cache,))
+            state_dict = torch.load(self.checkpoint_cache, map_location='cpu', mmap=True, weights_only=True)
+            self.pose_model.load_state_dict(state_dict, assign=True)
+        else:
+            print('Loading pose model from %s...' % (self.checkpoint,))
+            self.pose_model.load_state_dict(torch.load(self.checkpoint, map_location=self.device))
+        print('Pose model weights loaded in %.2fs' % (time.perf_counter() - start,))
 
         if len(self.gpus) > 1:
             self.pose_model = torch.nn.DataParallel(self.pose_model, device_ids=self.gpus).to(self.device)
         else:
             self.pose_model.to(self.device)
         self.pose_model.eval()
+        self.optimize_torch_models()
 
-        self.runtime_profile = {
-            'dt': [],
-            'pt': [],
-            'pn': []
+    # Applies the optional channels-last layout and torch.compile to the pose model and the detector
+    def optimize_torch_models(self):
+        print(f"[INFO] AlphaPose torch options: inference_mode={self.inference_mode}, channels_last={self.channels_last}, "
+              f"bf16={self.bf16}, compile={self.compile_model}")
+
+        detector = self.det_loader.detector
+        if not (self.channels_last or self.compile_model):
+            return
+
+        if detector.model is None:
+            detector.load_model()   # the detector is otherwise loaded lazily on the first frame
+
+        if self.channels_last:
+            self.pose_model = self.pose_model.to(memory_format=torch.channels_last)
+            detector.model = detector.model.to(memory_format=torch.channels_last)
+
+        if self.compile_model:
+            print("Compiling pose model and detector with torch.compile...")
+            self.pose_model = torch.compile(self.pose_model)
+            detector.model = torch.compile(detector.model)
+
+
+    # Detector input sizes for adaptive resolution (Darknet needs multiples of 32).
+    # The exported OpenVINO detector has a fixed input, so only the torch backend can switch
+    def input_sizes(self):
+        if self.backend != "torch" or self.detector != "yolo":
+            return []
+        inp_dim = self.det_loader.detector.inp_dim
+        return sorted({max(32, round(inp_dim * scale / 32) * 32) for scale in self.resolution_scales})
+
+    def apply_input_size(self, size):
+        self.det_loader.detector.set_input_dim(size)
+
+    # The score threshold is only applied in postprocess(), so cached outputs are shared between thresholds
+    def cache_settings(self):
+        if self.backend == "openvino":
+            model_files = file_fingerprint(self.pose_ir, self.detector_ir)
+            device = self.ov_device
+        else:
+            model_files = file_fingerprint(self.cfg_file, self.checkpoint)
+            device = str(self.device)
+        return {
+            "method": self.model_type,
+            "backend": self.backend,
+            "model": model_files,
+            "device": device,
+            "bf16": self.bf16,
+            "detector": self.detector,
+            "detector_input": getattr(self.det_loader.detector, "inp_dim", None),
+            "outputs": "keypoints+boxes",
         }
 
+    def inference_context(self):
+        stack = ExitStack()
+        stack.enter_context(torch.inference_mode() if self.inference_mode else torch.no_grad())
+        if self.bf16:
+            stack.enter_context(torch.autocast(device_type=self.device.type, dtype=torch.bfloat16))
+        return stack
+
     def run_model(self, padded):
         # TODO - AlphaPose can handle multiple image with parallelization, here we pass one-one even in directories
         norm_type = 'softmax'  # Default normalization (update based on cfg)
@@ -122,16 +267,19 @@ class AlphaPoseHPE(BaseHPE):
         batchSize = self.posebatch
         if flip:
             batchSize = int(batchSize / 2)
-        with torch.no_grad():
+        with self.inference_context():
                 (inps, orig_img, im_name, boxes, scores, ids, cropped_boxes) = self.det_loader.frame_preprocess(padded)
                 
                 if orig_img is None:
-                    return []
+                    return NO_POSES
 
                 orig_h, orig_w = orig_img.shape[:2]
                 
                 # Pose Estimation
-                inps = inps.to(self.device)
+                if self.channels_last:
+                    inps = inps.to(self.device, memory_format=torch.channels_last)
+                else:
+                    inps = inps.to(self.device)
                 datalen = inps.size(0)
                 leftover = 0
                 if (datalen) % batchSize:
@@ -151,13 +299,13 @@ class AlphaPoseHPE(BaseHPE):
                 if profile:
                     ckpt_time, pose_time = getTime(ckpt_time)
                     self.runtime_profile['pt'].append(pose_time)
-                hm = hm.cpu()
+                hm = hm.float().cpu()
 
                 # TODO - This should be done in postprocess
                 self.heatmap_to_coord = get_func_heatmap_to_coord(self.cfg)
 
                 if boxes is None or boxes.nelement() == 0:
-                    return []
+                    return NO_POSES
                 
                 keypoints_array = []
                 for j in range(hm.shape[0]):
@@ -172,13 +320,20 @@ class AlphaPoseHPE(BaseHPE):
                     # Combine coordinates and scores into a single array
                     person_keypoints = np.hstack((pose_coord, pose_score.reshape(-1, 1)))
                     keypoints_array.append(person_keypoints)
-                
-                return keypoints_array
+
+                # Detector boxes, for pose NMS
+                det_boxes = np.hstack((boxes.cpu().numpy() / np.array([orig_w, orig_h, orig_w, orig_h]), scores.cpu().numpy().reshape(-1, 1)))
+
+                return PosePredictions(keypoints_array, det_boxes)
         
     def postprocess(self, predictions):
         bodies = []
 
-        for person_keypoints in predictions:
+        poses = predictions.keypoints
+        if self.pose_nms and len(poses) > 1:
+            poses = self.merge_duplicate_poses(poses, predictions.boxes)
+
+        for person_keypoints in poses:
             normalized_kps = person_keypoints[:, :2]    # x, y coordinates normalized in [0,1]
             scores = person_keypoints[:, 2]
             valid_scores = scores > self.score_thresh
@@ -190,15 +345,15 @@ class AlphaPoseHPE(BaseHPE):
                 xmin, ymin = valid_kps.min(axis=0)
                 xmax, ymax = valid_kps.max(axis=0)
                 
-                # Rescale normalized keypoints to padded dimensions
-                keypoints = valid_kps * np.array([self.padding.padded_w, self.padding.padded_h])
+                # Rescale normalized keypoints to padded dimensions (all 17, so the COCO export keeps the joint order)
+                keypoints = normalized_kps * np.array([self.padding.padded_w, self.padding.padded_h])
                 keypoints = np.array(keypoints)
                 
                 body = Body(
                     score=np.mean(scores[valid_scores]),  # Average score of valid keypoints
                     xmin=int(xmin * self.padding.padded_w), ymin=int(ymin * self.padding.padded_h),
                     xmax=int(xmax * self.padding.padded_w), ymax=int(ymax * self.padding.padded_h),
-                    keypoints_score=scores[valid_scores],
+                    keypoints_score=scores,
                     keypoints=keypoints.astype(float),
                     keypoints_norm=normalized_kps
                 )
@@ -206,6 +361,20 @@ class AlphaPoseHPE(BaseHPE):
 
         return bodies
     
+    # Parametric pose NMS (AlphaPose pose_nms) in pixels: poses of the same person from
+    # overlapping detections are merged into one
+    def merge_duplicate_poses(self, poses, boxes):
+        size = np.array([self.padding.padded_w, self.padding.padded_h], dtype=np.float32)
+        poses = np.array(poses, dtype=np.float32)
+        pose_preds = torch.from_numpy(poses[:, :, :2] * size)
+        pose_scores = torch.from_numpy(poses[:, :, 2:].copy())
+        bboxes = torch.from_numpy((boxes[:, :4] * np.tile(size, 2)).astype(np.float32))
+        bbox_scores = torch.from_numpy(boxes[:, 4:].astype(np.float32))
+        bbox_ids = torch.zeros(len(poses), 1)
+
+        _, _, _, merged_preds, merged_scores, _ = pose_nms_body_batched(bboxes, bbox_scores, bbox_ids, pose_preds, pose_scores)
+        return [np.hstack((pred.numpy() / size, score.numpy())) for pred, score in zip(merged_preds, merged_scores)]
+
     # AlphaPose expects original resolution inputs
     # Override - No padding, no resizing
     def set_padding(self):
@@ -213,4 +382,33 @@ class AlphaPoseHPE(BaseHPE):
         self.padding = Padding(0, 0, self.img_w, self.img_h)
     
     def pad_and_resize(self, frame):
-        return frame
\ No newline at end of file
+        return frame
+
+class OpenVINOModel:
+    """
+    Runs an exported OpenVINO IR with the call signature of the torch module it replaces,
+    so it can stand in for the FastPose model (model(inps)) or the Darknet (model(imgs, args=args)).
+    """
+
+    def __init__(self, xml_path, settings):
+        from openvino import Core
+
+        if not os.path.exists(xml_path):
+            raise ValueError(f"OpenVINO model not found: {xml_path}. Run dev_tools/export_alphapose_openvino.py first")
+
+        self.compiled_model = Core().compile_model(str(xml_path), settings.device, settings.plugin_config())
+        log_runtime_settings(os.path.basename(str(xml_path)), self.compiled_model, 1)
+        self.infer_request = self.compiled_model.create_infer_request()
+        self.output = self.compiled_model.output(0)
+
+    def __call__(self, x, args=None):
+        results = self.infer_request.infer({0: x.detach().cpu().numpy()})
+        return torch.from_numpy(results[self.output].copy())
+
+def bf16_supported(device):
+    if device.type != 'cpu':
+        return torch.cuda.is_bf16_supported()
+    try:
+        return torch.ops.mkldnn._is_mkldnn_bf16_supported()
+    except (AttributeError, RuntimeError):
+        return False
\ No newline at end of file
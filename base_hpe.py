@@ -2,11 +2,20 @@ from abc import ABC, abstractmethod
 import cv2
 import os
 from collections import namedtuple
-import glob
 import time
 
 from utils.visualizer import render
-from utils.export_pose_results import append_COCO_format_json, append_COCO_format_csv, save_COCO_format_json, save_COCO_format_csv, save_Tx_csv_data
+from utils.output_sink import AsyncOutputSink
+from utils.adaptive_resolution import AdaptiveResolutionController
+from utils.frame_scheduler import FrameScheduler
+from utils.segmented_output import SegmentedOutput
+from utils.result_cache import ResultCache
+from utils.motion_gate import MotionGate
+from utils.frame_buffers import FrameBuffers
+from utils.frame_reader import FrameReader
+from utils.checkpoint import load_checkpoint, save_checkpoint
+from utils.roi import load_roi_config, bodies_box, expand_box, clip_box, is_valid_box, crop_region, offset_bodies
+from utils.export_pose_results import append_COCO_format_json, append_COCO_format_csv, append_dropped_frame_csv, save_COCO_format_json, save_COCO_format_csv, save_Tx_csv_data
 
 class Body:
     def __init__(self, score, xmin, ymin, xmax, ymax, keypoints_score, keypoints, keypoints_norm):
@@ -40,7 +49,29 @@ class BaseHPE(ABC):
                 show_scores = True,
                 show_bounding_box = True,
                 pd_w = 256,
-                pd_h = 256):
+                pd_h = 256,
+                output_queue_size=64,
+                output_full_policy="block",
+                encode_workers=2,
+                jpeg_quality=95,
+                target_latency_ms=None,
+                resolution_scales=(0.6, 0.8, 1.0),
+                frame_budget_ms=None,
+                drop_policy="drop-oldest",
+                keep_every=2,
+                roi_mode=False,
+                roi_margin=0.2,
+                roi_refresh=10,
+                roi_config=None,
+                segment_frames=None,
+                segment_minutes=None,
+                checkpoint_frames=None,
+                resume=False,
+                result_cache_dir=None,
+                result_cache_mb=1024,
+                motion_threshold=None,
+                motion_max_interval=30,
+                frame_source=None):
         super().__init__()
 
         self.json = enable_json
@@ -59,6 +90,14 @@ class BaseHPE(ABC):
         self.pd_h = pd_h
         self.current_image_file = ""
 
+        # Padding and resize buffers reused across frames, see pad_and_resize()
+        self.buffers = FrameBuffers()
+
+        # Adaptive input resolution (enabled by a target latency, see input_sizes())
+        self.target_latency_ms = target_latency_ms
+        self.resolution_scales = sorted(resolution_scales)
+        self.resolution_controller = None
+
         self.start_time_of_experiment = time.time()
         self.input_file = os.path.basename(os.path.normpath(input_src))
 
@@ -71,57 +110,24 @@ class BaseHPE(ABC):
             if not os.path.exists(self.output_dir):
                 os.makedirs(self.output_dir)
 
-        if os.path.isdir(input_src):
-            self.input_type = "directory"
-            self.img_dir = input_src
-            self.video_fps = 25
-        elif input_src:
-            if input_src.endswith('.jpg') or input_src.endswith('.png'):
-                self.input_type = "image"
-                self.img = cv2.imread(input_src)
-                self.img_h, self.img_w = self.img.shape[:2]
-                self.current_image_file = os.path.basename(input_src)
-            elif input_src.startswith("http"):
-                self.input_type = "ip_stream"
-                
-                print(f"Attempting to connect to IP stream at {input_src}...")
-
-                # e.g. 60 tries * 1s = 60 seconds timeout
-                max_retries = 60
-                for attempt in range(max_retries):
-                    self.cap = cv2.VideoCapture(input_src)
-                    if self.cap.isOpened():
-                        break
-                    print(f"[{attempt+1}/{max_retries}] Stream not available, retrying in 1s...")
-                    time.sleep(1)
-
-                if not self.cap.isOpened():
-                    raise ValueError(f"Failed to connect to video stream after {max_retries} attempts: {input_src}")
-
-                # Give OpenCV a small buffer time to fetch metadata
-                time.sleep(0.5)
-
-                self.video_fps = int(self.cap.get(cv2.CAP_PROP_FPS)) or 25
-                self.img_w = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-                self.img_h = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-            else:
-                if not input_src.isdigit():
-                    self.input_type = "video"
-                else:
-                    input_src = int(input_src)
-                    self.input_type = "webcam"
-                self.cap = cv2.VideoCapture(input_src)
-                self.cap.set(cv2.CAP_PROP_AUTOFOCUS, 0)
-                self.cap.set(cv2.CAP_PROP_FOCUS, 0)
-                self.video_fps = int(self.cap.get(cv2.CAP_PROP_FPS))
-                self.img_w = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-                self.img_h = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-                
-            self.set_padding()
+        if frame_source is None:
+            frame_source = FrameReader(input_src)
+            input_src = frame_source.input_src   # webcam indices are converted to int
+            # Methods that read the input themselves (AlphaPose's detection loaders) use these
+            self.cap = frame_source.cap
+            self.img_dir = frame_source.img_dir
         else:
-            raise ValueError("No valid input source provided")
-            
-        self.input_src = input_src  
+            # The input is opened by the fan-out process, only its type and size are needed here
+            self.cap = None
+            self.img_dir = None
+        self.reader = frame_source
+        self.input_type = frame_source.input_type
+        self.video_fps = frame_source.video_fps
+        self.img_w, self.img_h = frame_source.img_w, frame_source.img_h
+        if self.img_w and self.img_h:
+            self.set_padding()
+
+        self.input_src = input_src
 
         if (self.input_type == "directory" or self.input_type == "image") and self.save_video:
             raise ValueError("image input - video output not supported!")
@@ -131,85 +137,292 @@ class BaseHPE(ABC):
             filename = os.path.join(self.output_dir, "video.avi")
             self.output = cv2.VideoWriter(filename, fourcc, self.video_fps, (self.img_w, self.img_h))
 
+        # Region of interest: crop to the previous frame's people, with static regions from roi_config
+        self.roi_mode = roi_mode
+        self.roi_margin = roi_margin
+        self.roi_refresh = max(1, roi_refresh)
+        self.static_roi, self.exclusion_zones = load_roi_config(roi_config) if roi_config else (None, [])
+        self.prev_people_box = None
+
+        # Live inputs can drop frames that would miss their deadline
+        self.scheduler = None
+        if frame_budget_ms:
+            if self.input_type in ("webcam", "ip_stream"):
+                self.scheduler = FrameScheduler(frame_budget_ms, self.video_fps, policy=drop_policy, every_n=keep_every)
+            else:
+                print(f"[INFO] The frame scheduler only applies to webcam and IP stream input, processing every frame of the {self.input_type}")
+
+        # Long runs can write the json/csv exports in segments (created in main_loop, once model_type is known)
+        self.segment_frames = segment_frames
+        self.segment_minutes = segment_minutes
+        self.segments = None
+
+        # Directory and video runs can be resumed from the last saved segment
+        self.checkpoint_frames = checkpoint_frames
+        self.resume = resume
+        self.checkpoint = False
+        if checkpoint_frames or resume:
+            if self.input_type not in ("directory", "video"):
+                print(f"[INFO] Checkpoints are only written for directory and video input, not for the {self.input_type}")
+            elif not (self.json or self.csv):
+                print("[INFO] Checkpoints need json or csv export, nothing would be saved")
+            elif not (checkpoint_frames or segment_frames or segment_minutes):
+                raise ValueError("Resuming needs the checkpoint interval of the original run (checkpoint_frames)")
+            else:
+                self.checkpoint = True
+
+        # Model outputs of images and videos can be cached on disk for reruns, see predict()
+        self.result_cache = None
+        if result_cache_dir:
+            if self.input_type in ("image", "directory", "video"):
+                self.result_cache = ResultCache(result_cache_dir, result_cache_mb * 2**20)
+            else:
+                print(f"[INFO] The result cache only applies to image, directory and video input, not to the {self.input_type}")
+
+        # Static scenes: frames without motion reuse the poses of the last frame, see process_frame()
+        self.motion_gate = MotionGate(motion_threshold, motion_max_interval) if motion_threshold is not None else None
+        self.prev_bodies = []
+
+        # Encoding and disk writes of rendered frames run on background workers
+        self.sink = None
+        if self.save_image or self.save_video:
+            self.sink = AsyncOutputSink(video_writer=self.output if self.save_video else None,
+                                        queue_size=output_queue_size,
+                                        full_policy=output_full_policy,
+                                        num_workers=encode_workers,
+                                        jpeg_quality=jpeg_quality)
+
     @abstractmethod
     def load_model(self):
         pass
     
-    def main_loop(self):
-        frame_number = 0
-
-        if self.input_type == "image":
-            self.process_frame(self.img, frame_number)
-
-        elif self.input_type == "directory":
-            # Get all image files from the directory
-            image_files = glob.glob(os.path.join(self.img_dir, '*.[pjg][np][ge]*'))
-            print(f"Found {len(image_files)} images in {self.img_dir}")
-
-            # Sort files to ensure they are in alphanumeric order
-            image_files = sorted(image_files)
-            
-            total_frames = len(image_files)
-            for image_file in image_files:
-                print(f"Processing {frame_number+1}/{total_frames}")
-                self.img = cv2.imread(image_file)
-                if self.img is None:
-                    print(f"Failed to load image: {image_file}")
-                    continue
-
-                self.img_h, self.img_w = self.img.shape[:2]
-                self.set_padding()
-                self.process_frame(self.img, frame_number)
+    # Methods that finish frames asynchronously complete them here, before the outputs are saved
+    def flush_pending_frames(self):
+        pass
 
-                frame_number += 1
-        
-        else:   # webcam, video or stream
-            print("Starting processing video/webcam data. Press CTR+C to exit")
-            while True:
-                ok, frame = self.cap.read()
-                if not ok:
-                    break
+    # Input sizes the adaptive resolution controller can switch between, smallest first.
+    # Methods supporting it precompile these in load_model() and override apply_input_size()
+    def input_sizes(self):
+        return []
 
-                self.univ_time = self.cap.get(cv2.CAP_PROP_POS_MSEC)  # timestamp of current frame, in milliseconds
+    def apply_input_size(self, size):
+        pass
 
-                self.process_frame(frame, frame_number)
+    def init_resolution_controller(self):
+        sizes = self.input_sizes()
+        if len(sizes) < 2:
+            print(f"[INFO] Adaptive resolution is not supported by {self.model_type}, keeping a fixed input size")
+            return
+        self.resolution_controller = AdaptiveResolutionController(sizes, self.target_latency_ms)
+        self.apply_input_size(self.resolution_controller.size)
+        print(f"[INFO] Adaptive resolution: sizes {sizes}, target latency {self.target_latency_ms}ms")
 
-                frame_number += 1
+    def main_loop(self):
+        if self.target_latency_ms:
+            self.init_resolution_controller()
+
+        output_prefix = f"{self.start_time_of_experiment}_{self.model_type}_{self.input_file}"
+        resume_state = None
+        if self.checkpoint and self.resume:
+            resume_state = load_checkpoint(self.output_dir, self.input_src, self.model_type)
+        if resume_state:
+            output_prefix = resume_state["prefix"]
+            print(f"[INFO] Resuming {output_prefix} after frame {resume_state['last_frame']}")
+
+        segment_frames = self.segment_frames or self.checkpoint_frames
+        if (self.json or self.csv) and (segment_frames or self.segment_minutes):
+            self.segments = SegmentedOutput(self.output_dir, output_prefix, self.json, self.csv,
+                                            segment_frames=segment_frames, segment_minutes=self.segment_minutes,
+                                            resume=resume_state is not None,
+                                            last_frame=resume_state["last_frame"] if resume_state else None)
+        self.output_prefix = output_prefix
+
+        # Frames from the input, or from the fan-out process of a multi-method run (see fanout_hpe.py)
+        for frame, frame_number, univ_time, source in self.reader.frames(resume_state, skip=self.skip_frame):
+            self.univ_time = univ_time
+            self.current_image_file = source
+            if frame.shape[:2] != (self.img_h, self.img_w):
+                self.img_h, self.img_w = frame.shape[:2]
+                self.set_padding()
 
-        if self.json:
-            save_COCO_format_json(os.path.join(self.output_dir, "COCOformat.json"))
-        if self.csv:
-            save_COCO_format_csv(os.path.join(self.output_dir, f"{self.start_time_of_experiment}_{self.model_type}_{self.input_file}_JSON.csv"))
-            save_Tx_csv_data(os.path.join(self.output_dir, f"{self.start_time_of_experiment}_{self.model_type}_{self.input_file}_Tx.csv"))
+            self.process_frame(frame, frame_number)
+
+        self.flush_pending_frames()
+        if self.scheduler:
+            print(self.scheduler.summary())
+        if self.result_cache:
+            print(self.result_cache.summary())
+        if self.motion_gate:
+            print(self.motion_gate.summary())
+
+        if self.segments:
+            closed = self.segments.close()
+            if self.checkpoint and self.segments.segments:
+                save_checkpoint(self.output_dir, self.input_src, self.model_type, output_prefix,
+                                closed or self.segments.segments[-1], complete=True)
+        else:
+            if self.json:
+                save_COCO_format_json(os.path.join(self.output_dir, "COCOformat.json"))
+            if self.csv:
+                save_COCO_format_csv(os.path.join(self.output_dir, f"{output_prefix}_JSON.csv"))
+                save_Tx_csv_data(os.path.join(self.output_dir, f"{output_prefix}_Tx.csv"))
+
+        # Last, so the json/csv results are saved even if rendered frames failed to write
+        if self.sink:
+            self.sink.close()
 
     def process_frame(self, frame, frame_number):
-        timestamp = time.time()
+        if self.motion_gate and self.motion_gate.is_static(frame, frame_number):
+            # The last poses may still be in flight
+            self.flush_pending_frames()
+            self.output_frame(frame, frame_number, time.time(), self.prev_bodies, reused=True)
+        else:
+            self.infer_frame(frame, frame_number)
 
-        padded = self.pad_and_resize(frame)
-        predictions = self.run_model(padded)
-        bodies = self.postprocess(predictions)
+    def infer_frame(self, frame, frame_number):
+        timestamp = time.time()
 
+        region = self.select_region(frame_number)
+        if region is None:
+            predictions = self.predict(frame)
+            bodies = self.postprocess(predictions)
+        else:
+            bodies = self.infer_region(frame, region)
+
+        self.output_frame(frame, frame_number, timestamp, bodies)
+
+    # run_model() on the padded frame, or its output from the result cache
+    def predict(self, frame):
+        key = self.cache_key(frame)
+        cached = self.result_cache.get(key) if key else None
+        if cached is not None:
+            return self.from_cache(cached)
+
+        predictions = self.run_model(self.pad_and_resize(frame))
+        if key:
+            self.result_cache.put(key, self.to_cache(predictions))
+        return predictions
+
+    # Settings that change the output of run_model() (model file, precision, decoder options),
+    # part of the result cache key. Methods return None when their output cannot be cached
+    def cache_settings(self):
+        return None
+
+    def cache_key(self, frame):
+        if self.result_cache is None:
+            return None
+        settings = self.cache_settings()
+        if settings is None:
+            return None
+        return self.result_cache.key(frame, {**settings, "input_size": (self.pd_w, self.pd_h), "padding": self.padding})
+
+    # Conversion of the run_model() output to a picklable cache value and back
+    def to_cache(self, predictions):
+        return predictions
+
+    def from_cache(self, value):
+        return value
+
+    # Everything after inference: per-frame bookkeeping, exports and rendering
+    # Frames whose poses were reused from the last inferred frame (motion gate) are marked "reused"
+    def output_frame(self, frame, frame_number, timestamp, bodies, reused=False):
+        self.prev_bodies = bodies
+        self.prev_people_box = bodies_box(bodies)
+        status = self.scheduler.finish_frame(time.time()) if self.scheduler else "ok"
+        if reused:
+            status = "reused"
+
+        # Reused frames say nothing about the inference latency
+        if self.resolution_controller and not reused:
+            latency_ms = (time.time() - timestamp) * 1000
+            person_heights = [(body.ymax - body.ymin) / self.img_h for body in bodies]
+            size = self.resolution_controller.update(frame_number, latency_ms, person_heights)
+            if size is not None:
+                self.apply_input_size(size)
+
+        if self.segments:
+            self.add_to_segment(frame_number, timestamp)
         if self.json:
-            append_COCO_format_json(bodies, self.score_thresh, frame_number, self.univ_time)
+            append_COCO_format_json(bodies, self.score_thresh, frame_number, self.univ_time, reused)
         if self.csv:
-            append_COCO_format_csv(bodies, self.score_thresh, frame_number, timestamp, self.measurement_interval_ms)
+            append_COCO_format_csv(bodies, self.score_thresh, frame_number, timestamp, self.measurement_interval_ms, status)
 
         if self.save_image or self.save_video:
             # Ensure that LINES_BODY is defined in the child class
             if not hasattr(self, 'LINES_BODY'):
                 raise ValueError("LINES_BODY is not defined in the child class.")
-            
+
+            # The capture buffer is overwritten by the next frame while the sink may still hold this one.
+            # Frames already copied (e.g. while their poses were decoded in the decode pool) are not copied again
+            if self.reader.reuses_memory(frame):
+                frame = frame.copy()
             render(frame, bodies, self.LINES_BODY, self.score_thresh, self.show_scores, self.show_bounding_box)
 
             if self.save_video:
                 if not self.output.isOpened():
                     raise ValueError("Failed to open the video writer")
-                self.output.write(frame)
+                self.sink.submit_video_frame(frame)
 
             elif self.save_image:
                 filename = os.path.join(self.output_dir, f"frame_{frame_number:04d}.jpg")
-                cv2.imwrite(filename, frame)
+                self.sink.submit_image(filename, frame)
     
+    # Called by the reader after every grab of a live input: frames the scheduler drops are not decoded
+    def skip_frame(self, frame_number, grab_start, grab_end):
+        if self.scheduler and not self.scheduler.should_process(frame_number, grab_start, grab_end):
+            self.drop_frame(frame_number, grab_end)
+            return True
+        return False
+
+    # Frames skipped by the frame scheduler are still counted in the exports
+    def drop_frame(self, frame_number, timestamp):
+        if self.segments:
+            self.add_to_segment(frame_number, timestamp)
+        if self.csv:
+            append_dropped_frame_csv(frame_number, timestamp, self.measurement_interval_ms)
+
+    # Starts a new segment when the open one is full; with checkpoints, the progress is saved with every segment
+    def add_to_segment(self, frame_number, timestamp):
+        closed = self.segments.add_frame(frame_number, timestamp, self.current_image_file)
+        if closed and self.checkpoint:
+            save_checkpoint(self.output_dir, self.input_src, self.model_type, self.output_prefix, closed)
+
+    # Region of the frame to run inference on, None for the whole frame.
+    # With roi_mode, this is the previous frame's people plus a margin, except on
+    # every roi_refresh-th frame, which covers the whole frame (or static ROI) to find new people
+    def select_region(self, frame_number):
+        frame_box = (0, 0, self.img_w, self.img_h)
+        bounds = clip_box(self.static_roi, frame_box) if self.static_roi else frame_box
+        if not is_valid_box(bounds):
+            bounds = frame_box
+
+        region = bounds
+        tracking = self.roi_mode and self.input_type not in ("image", "directory")
+        if tracking and self.prev_people_box and frame_number % self.roi_refresh != 0:
+            people = clip_box(self.prev_people_box, bounds)
+            if is_valid_box(people):
+                region = expand_box(people, self.roi_margin, bounds)
+
+        if region == frame_box and not self.exclusion_zones:
+            return None
+        return region
+
+    # Runs the model on a crop of the frame at full model resolution and maps the bodies back to the frame
+    def infer_region(self, frame, region):
+        x0, y0 = region[:2]
+        crop = crop_region(frame, region, self.exclusion_zones)
+
+        img_w, img_h = self.img_w, self.img_h
+        self.img_h, self.img_w = crop.shape[:2]
+        self.set_padding()
+        try:
+            bodies = self.postprocess(self.run_model(self.pad_and_resize(crop)))
+        finally:
+            self.img_w, self.img_h = img_w, img_h
+            self.set_padding()
+
+        return offset_bodies(bodies, x0, y0, img_w, img_h)
+
     @abstractmethod
     def run_model(self, padded):
         pass
@@ -231,8 +444,12 @@ class BaseHPE(ABC):
             self.padding = Padding(pad_w, 0, self.img_w + pad_w, self.img_h)
 
     # Pad and resize the image to prepare for the model input.
+    # Both steps write into reused buffers; the padded canvas is keyed by the frame shape, so its
+    # border is never written and stays zero. The result is only valid until the next call
     def pad_and_resize(self, frame):
-        padded = cv2.copyMakeBorder(frame, 0, self.padding.h, 0, self.padding.w, cv2.BORDER_CONSTANT)
-        padded = cv2.resize(padded, (self.pd_w, self.pd_h), interpolation=cv2.INTER_AREA)
+        h, w = frame.shape[:2]
+        padded = self.buffers.get(("padded", frame.shape), (h + self.padding.h, w + self.padding.w) + frame.shape[2:], frame.dtype)
+        padded[:h, :w] = frame
 
-        return padded
\ No newline at end of file
+        resized = self.buffers.get("resized", (self.pd_h, self.pd_w) + frame.shape[2:], frame.dtype)
+        return cv2.resize(padded, (self.pd_w, self.pd_h), dst=resized, interpolation=cv2.INTER_AREA)
\ No newline at end of file
@@ -0,0 +1,95 @@
+"""
+Development-only benchmark of the tag matchers of the associative embedding decoder.
+
+Generates synthetic crowds (people with a tag and a center, joints with noisy tags
+and positions plus low-score distractors), groups them with the Hungarian and the
+greedy matcher, and prints the grouping time and accuracy of both. Accuracy is the
+share of joint pairs whose same-person / different-person relation matches the
+ground truth.
+
+Usage (from the repository root):
+    python3 dev_tools/benchmark_ae_matcher.py --people 10,20,30 --tag_noise 0.2
+"""
+
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import time
+
+import numpy as np
+
+from models.OpenVINO.model_api.models.hpe_associative_embedding import AssociativeEmbeddingDecoder, TAG_MATCHERS
+
+NUM_JOINTS = 17
+MAX_NUM_PEOPLE = 30   # candidates per joint, as configured in HpeAssociativeEmbedding
+
+def make_decoder(matcher):
+    return AssociativeEmbeddingDecoder(num_joints=NUM_JOINTS, max_num_people=MAX_NUM_PEOPLE, detection_threshold=0.1,
+                                       use_detection_val=True, ignore_too_much=False, tag_threshold=1,
+                                       pose_threshold=0.1, dist_reweight=True, matcher=matcher)
+
+def make_crowd(rng, people, tag_noise, size=128):
+    """Returns the decoder input (tag_k, loc_k, val_k) of one image and the true person id of every candidate (-1 for distractors)."""
+    person_tags = rng.permutation(people) * 1.5 + rng.random(people) * 0.3
+    centers = rng.random((people, 2)) * size
+
+    tag_k = np.zeros((NUM_JOINTS, MAX_NUM_PEOPLE, 1), dtype=np.float32)
+    loc_k = rng.integers(0, size, (NUM_JOINTS, MAX_NUM_PEOPLE, 2)).astype(np.float32)
+    val_k = rng.uniform(0, 0.1, (NUM_JOINTS, MAX_NUM_PEOPLE)).astype(np.float32)
+    person_ids = np.full((NUM_JOINTS, MAX_NUM_PEOPLE), -1)
+
+    for k in range(NUM_JOINTS):
+        ids = np.flatnonzero(rng.random(people) < 0.85)[:MAX_NUM_PEOPLE]   # some joints are not visible
+        n = len(ids)
+        tag_k[k, :n, 0] = person_tags[ids] + rng.normal(0, tag_noise, n)
+        loc_k[k, :n] = np.round(centers[ids] + rng.normal(0, 6, (n, 2)))
+        val_k[k, :n] = rng.uniform(0.2, 1.0, n)
+        person_ids[k, :n] = ids
+    return (tag_k, loc_k, val_k), person_ids
+
+def pair_accuracy(poses, inputs, person_ids):
+    tag_k, loc_k, val_k = inputs
+    # Candidates are identified by their (unique) score
+    candidate = {(k, float(v)): m for k in range(NUM_JOINTS) for m, v in enumerate(val_k[k])}
+    true_ids, pred_ids = [], []
+    for pose_id, pose in enumerate(poses):
+        for k, joint in enumerate(pose):
+            m = candidate.get((k, float(joint[2])))
+            if joint[2] > 0 and m is not None and person_ids[k, m] >= 0:
+                true_ids.append(person_ids[k, m])
+                pred_ids.append(pose_id)
+
+    true_ids, pred_ids = np.array(true_ids), np.array(pred_ids)
+    same_true = true_ids[:, None] == true_ids[None, :]
+    same_pred = pred_ids[:, None] == pred_ids[None, :]
+    upper = np.triu_indices(len(true_ids), k=1)
+    return float(np.mean(same_true[upper] == same_pred[upper])) if len(upper[0]) else 1.0
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--people", type=str, default="5,10,20,30", help="Comma separated crowd sizes (default=%(default)s)")
+    parser.add_argument("--tag_noise", type=float, default=0.2, help="Std of the joint tags around the person tag (default=%(default)s)")
+    parser.add_argument("--crowds", type=int, default=50, help="Number of crowds per size (default=%(default)s)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default=%(default)s)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    decoders = {matcher: make_decoder(matcher) for matcher in TAG_MATCHERS}
+
+    print(f"{'people':>8}{'matcher':>12}{'ms/image':>10}{'pair acc':>10}")
+    for people in (int(p) for p in args.people.split(',')):
+        crowds = [make_crowd(rng, people, args.tag_noise) for _ in range(args.crowds)]
+        for matcher, decoder in decoders.items():
+            elapsed = 0.0
+            accuracies = []
+            for inputs, person_ids in crowds:
+                start = time.perf_counter()
+                poses, _ = decoder._match_by_tag(inputs)
+                elapsed += time.perf_counter() - start
+                accuracies.append(pair_accuracy(poses, inputs, person_ids))
+            print(f"{people:>8}{matcher:>12}{1000 * elapsed / len(crowds):>10.2f}{np.mean(accuracies):>10.4f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Development-only benchmark of the AlphaPose CPU performance options.
+Runs the detector + pose model on the bundled test images once per option set
+and prints the per-frame latency and speedup against plain fp32 eager mode.
+
+Usage (from the repository root):
+    python3 dev_tools/benchmark_alphapose_cpu.py --torch_threads 4 --repeats 10
+"""
+
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import glob
+import statistics
+import time
+
+import cv2
+import torch
+
+from alphapose_hpe import AlphaPoseHPE, bf16_supported
+
+CONFIGS = [
+    ("fp32 eager (baseline)", {}),
+    ("+ inference_mode", {"inference_mode": True}),
+    ("+ channels_last", {"inference_mode": True, "channels_last": True}),
+    ("+ bf16 autocast", {"inference_mode": True, "channels_last": True, "bf16": True}),
+    ("+ torch.compile", {"inference_mode": True, "channels_last": True, "compile_model": True}),
+]
+
+def benchmark(images, options, torch_threads, warmup, repeats):
+    hpe = AlphaPoseHPE(input_src=images[0], device="CPU", torch_threads=torch_threads, **options)
+    hpe.load_model()
+
+    latencies = []
+    for image_file in images:
+        img = cv2.imread(image_file)
+        hpe.img_h, hpe.img_w = img.shape[:2]
+        hpe.set_padding()
+
+        for i in range(warmup + repeats):
+            start = time.perf_counter()
+            hpe.run_model(hpe.pad_and_resize(img))
+            if i >= warmup:
+                latencies.append((time.perf_counter() - start) * 1000)
+
+    return latencies
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", type=str, default="unit_tests/images", help="Directory with test images (default=%(default)s)")
+    parser.add_argument("--torch_threads", type=int, help="Number of torch intra-op threads")
+    parser.add_argument("--warmup", type=int, default=2, help="Untimed runs per image (default=%(default)s)")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed runs per image (default=%(default)s)")
+    args = parser.parse_args()
+
+    images = sorted(glob.glob(os.path.join(args.images, '*.[pj][pn]g')))
+    if not images:
+        raise ValueError(f"No images found in {args.images}")
+
+    results = []
+    for name, options in CONFIGS:
+        if options.get("bf16") and not bf16_supported(torch.device("cpu")):
+            print(f"Skipping '{name}': bf16 is not supported on this CPU")
+            continue
+        print(f"Running '{name}'...")
+        latencies = benchmark(images, options, args.torch_threads, args.warmup, args.repeats)
+        results.append((name, statistics.mean(latencies), statistics.median(latencies)))
+
+    baseline = results[0][1]
+    print(f"\n{'configuration':<24}{'mean ms':>10}{'median ms':>12}{'speedup':>10}")
+    for name, mean, median in results:
+        print(f"{name:<24}{mean:>10.1f}{median:>12.1f}{baseline / mean:>9.2f}x")
+
+if __name__ == "__main__":
+    main()
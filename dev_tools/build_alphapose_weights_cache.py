@@ -0,0 +1,67 @@
+"""
+One-time conversion of the AlphaPose weights into memory-mappable torch files.
+
+Parsing yolov3-spp.weights and deserializing fast_res50_256x192.pth dominate the
+AlphaPose startup time. This script writes both models as plain state dicts in
+the torch zip format next to the originals; AlphaPoseHPE.load_model then loads
+them with torch.load(mmap=True) automatically while they are newer than the
+source files.
+
+Usage (from the repository root):
+    python3 dev_tools/build_alphapose_weights_cache.py
+"""
+
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import time
+from types import SimpleNamespace
+
+import torch
+
+from alphapose_hpe import DEFAULT_CHECKPOINT, DEFAULT_CHECKPOINT_CACHE
+from models.AlphaPose.detector.yolo_api import YOLODetector
+from models.AlphaPose.detector.yolo_cfg import cfg as yolo_cfg
+from models.AlphaPose.detector.yolo.darknet import Darknet
+
+def convert_pose_checkpoint(checkpoint, cache):
+    start = time.perf_counter()
+    state_dict = torch.load(checkpoint, map_location='cpu')
+    load_time = time.perf_counter() - start
+    torch.save(state_dict, cache)
+
+    start = time.perf_counter()
+    torch.load(cache, map_location='cpu', mmap=True, weights_only=True)
+    cache_time = time.perf_counter() - start
+    print(f"Pose model: {checkpoint} -> {cache} ({os.path.getsize(cache) / 1e6:.1f} MB), "
+          f"load {load_time:.2f}s -> {cache_time:.2f}s")
+
+def convert_detector_weights():
+    detector = YOLODetector(yolo_cfg, SimpleNamespace(gpus=[-1], device=torch.device('cpu')))
+
+    start = time.perf_counter()
+    model = Darknet(detector.model_cfg)
+    model.load_weights(detector.model_weights)
+    load_time = time.perf_counter() - start
+    torch.save(model.state_dict(), detector.weights_cache)
+
+    start = time.perf_counter()
+    model = Darknet(detector.model_cfg)
+    model.load_state_dict(torch.load(detector.weights_cache, map_location='cpu', mmap=True, weights_only=True), assign=True)
+    cache_time = time.perf_counter() - start
+    print(f"Detector: {detector.model_weights} -> {detector.weights_cache} "
+          f"({os.path.getsize(detector.weights_cache) / 1e6:.1f} MB), load {load_time:.2f}s -> {cache_time:.2f}s")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--checkpoint", type=str, default=DEFAULT_CHECKPOINT, help="FastPose checkpoint (default=%(default)s)")
+    parser.add_argument("--checkpoint_cache", type=str, default=DEFAULT_CHECKPOINT_CACHE, help="Output cache for the pose model (default=%(default)s)")
+    args = parser.parse_args()
+
+    convert_pose_checkpoint(args.checkpoint, args.checkpoint_cache)
+    convert_detector_weights()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Accuracy versus latency evaluation of the HPE methods.
+
+Runs each selected method over a directory of COCO images, scores its
+COCOformat.json output against the keypoint annotations with COCOeval, and
+prints a table of AP/AR against mean and p99 per-frame latency. Methods on the
+Pareto front (no other method is both more accurate and faster) are marked.
+
+Usage (from the repository root):
+    python3 dev_tools/evaluate_methods.py --methods movenet,ae1,openpose \
+        --images data/coco/val2017 --annotations data/coco/annotations/person_keypoints_val2017.json
+"""
+
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import contextlib
+import csv
+import io
+import json
+import time
+
+import numpy as np
+from pycocotools.coco import COCO
+from pycocotools.cocoeval import COCOeval
+
+from main import parse_arguments, get_hpe_method
+from utils.export_pose_results import reset_results
+
+def run_method(method, images, output_dir, device, extra_args):
+    """Runs one method over the image directory. Returns (results json path, {frame_number: file}, latencies in ms)."""
+    method_dir = os.path.join(output_dir, method)
+    args = parse_arguments().parse_args(['--method', method, '--input', images, '--json',
+                                         '--output_dir', method_dir, '--device', device] + extra_args)
+
+    reset_results()
+    hpe = get_hpe_method(args)
+    hpe.load_model()
+
+    frame_files = {}
+    latencies = []
+    process_frame = hpe.process_frame
+
+    def timed_process_frame(frame, frame_number):
+        start = time.perf_counter()
+        process_frame(frame, frame_number)
+        latencies.append((time.perf_counter() - start) * 1000)
+        frame_files[frame_number] = hpe.current_image_file
+
+    hpe.process_frame = timed_process_frame
+    hpe.main_loop()
+
+    return os.path.join(method_dir, "COCOformat.json"), frame_files, latencies
+
+def score(coco_gt, results_file, frame_files):
+    # main.py numbers images by their position in the directory, map them back to COCO ids
+    file_to_id = {img['file_name']: img['id'] for img in coco_gt.dataset['images']}
+    with open(results_file) as f:
+        results = json.load(f)
+
+    detections = []
+    for result in results:
+        image_id = file_to_id.get(frame_files.get(result['image_id']))
+        if image_id is None:
+            continue
+        detections.append({**result, 'image_id': image_id})
+
+    img_ids = sorted({file_to_id[f] for f in frame_files.values() if f in file_to_id})
+    if not detections or not img_ids:
+        return 0.0, 0.0, 0.0
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        coco_dt = coco_gt.loadRes(detections)
+        coco_eval = COCOeval(coco_gt, coco_dt, 'keypoints')
+        coco_eval.params.imgIds = img_ids
+        coco_eval.evaluate()
+        coco_eval.accumulate()
+        coco_eval.summarize()
+
+    # stats: 0 = AP @[.5:.95], 1 = AP @.5, 5 = AR @[.5:.95]
+    return float(coco_eval.stats[0]), float(coco_eval.stats[1]), float(coco_eval.stats[5])
+
+def pareto_front(rows):
+    front = set()
+    for row in rows:
+        dominated = any(
+            other['AP'] >= row['AP'] and other['mean_ms'] <= row['mean_ms'] and
+            (other['AP'] > row['AP'] or other['mean_ms'] < row['mean_ms'])
+            for other in rows if other is not row)
+        if not dominated:
+            front.add(row['method'])
+    return front
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--methods", type=str, required=True, help="Comma separated list of methods, e.g. movenet,ae1,openpose")
+    parser.add_argument("--images", type=str, required=True, help="Directory with the annotated images")
+    parser.add_argument("--annotations", type=str, required=True, help="COCO person keypoints annotation file")
+    parser.add_argument("--device", type=str, default="CPU", help="Device passed to every method (default=%(default)s)")
+    parser.add_argument("--output_dir", type=str, default="out/eval", help="Directory for the per-method results (default=%(default)s)")
+    parser.add_argument("--warmup", type=int, default=1, help="Number of first frames excluded from latency statistics (default=%(default)s)")
+    args, extra_args = parser.parse_known_args()   # remaining options are passed on to main.py
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        coco_gt = COCO(args.annotations)
+
+    rows = []
+    for method in args.methods.split(','):
+        method = method.strip()
+        print(f"Evaluating {method}...")
+        results_file, frame_files, latencies = run_method(method, args.images, args.output_dir, args.device, extra_args)
+        ap, ap50, ar = score(coco_gt, results_file, frame_files)
+
+        timed = np.array(latencies[args.warmup:] if len(latencies) > args.warmup else latencies)
+        rows.append({
+            'method': method,
+            'AP': ap,
+            'AP50': ap50,
+            'AR': ar,
+            'mean_ms': float(np.mean(timed)) if len(timed) else 0.0,
+            'p99_ms': float(np.percentile(timed, 99)) if len(timed) else 0.0,
+            'frames': len(latencies),
+        })
+
+    front = pareto_front(rows)
+    rows.sort(key=lambda r: r['mean_ms'])
+
+    print(f"\n{'method':<12}{'AP':>8}{'AP50':>8}{'AR':>8}{'mean ms':>10}{'p99 ms':>10}{'frames':>8}  pareto")
+    for row in rows:
+        print(f"{row['method']:<12}{row['AP']:>8.3f}{row['AP50']:>8.3f}{row['AR']:>8.3f}"
+              f"{row['mean_ms']:>10.1f}{row['p99_ms']:>10.1f}{row['frames']:>8}  {'*' if row['method'] in front else ''}")
+
+    summary_file = os.path.join(args.output_dir, "accuracy_latency.csv")
+    with open(summary_file, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()) + ['pareto'])
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({**row, 'pareto': row['method'] in front})
+    print(f"Saving file {summary_file}")
+
+if __name__ == "__main__":
+    main()
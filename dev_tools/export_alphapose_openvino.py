@@ -0,0 +1,133 @@
+"""
+Exports the AlphaPose FastPose checkpoint and the YOLOv3-SPP Darknet detector to
+OpenVINO IR, for use with `--alphapose_backend openvino`.
+
+With --verify, both backends are run on the test images afterwards and the
+keypoints are checked to match within --tolerance pixels.
+
+Usage (from the repository root):
+    python3 dev_tools/export_alphapose_openvino.py --verify
+"""
+
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import glob
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+import torch
+import openvino as ov
+
+from alphapose_hpe import AlphaPoseHPE, DEFAULT_CFG, DEFAULT_CHECKPOINT, DEFAULT_POSE_IR, DEFAULT_DETECTOR_IR
+from models.AlphaPose.alphapose.models import builder
+from models.AlphaPose.alphapose.utils.config import update_config
+from models.AlphaPose.detector.yolo_api import YOLODetector
+from models.AlphaPose.detector.yolo_cfg import cfg as yolo_cfg
+
+class DarknetExportWrapper(torch.nn.Module):
+    # Darknet.forward needs the runtime args namespace, fix it for tracing
+    def __init__(self, darknet):
+        super().__init__()
+        self.darknet = darknet
+        self.args = SimpleNamespace(device=torch.device("cpu"))
+
+    def forward(self, x):
+        return self.darknet(x, self.args)
+
+def export_pose_model(cfg_file, checkpoint, output_xml):
+    cfg = update_config(cfg_file)
+    model = builder.build_sppe(cfg.MODEL, preset_cfg=cfg.DATA_PRESET)
+    model.load_state_dict(torch.load(checkpoint, map_location="cpu"))
+    model.eval()
+
+    h, w = cfg.DATA_PRESET.IMAGE_SIZE
+    print(f"Converting pose model {checkpoint} (input 3x{h}x{w}, dynamic batch)...")
+    with torch.no_grad():
+        ov_model = ov.convert_model(model, example_input=torch.zeros(1, 3, h, w),
+                                    input=[ov.PartialShape([-1, 3, h, w])])
+    ov.save_model(ov_model, output_xml, compress_to_fp16=False)
+    print(f"Saved {output_xml}")
+
+def export_detector(inp_dim, batch_size, output_xml):
+    opt = SimpleNamespace(gpus=[-1], device=torch.device("cpu"))
+    detector = YOLODetector(yolo_cfg, opt)
+    detector.inp_dim = inp_dim
+    detector.load_model()
+    model = DarknetExportWrapper(detector.model).eval()
+
+    print(f"Converting detector {detector.model_weights} (input {batch_size}x3x{inp_dim}x{inp_dim})...")
+    with torch.no_grad():
+        ov_model = ov.convert_model(model, example_input=torch.zeros(batch_size, 3, inp_dim, inp_dim))
+    ov.save_model(ov_model, output_xml, compress_to_fp16=False)
+    print(f"Saved {output_xml}")
+
+def match_poses(ref_poses, test_poses):
+    """Greedily pairs each reference pose with the closest test pose; returns per-pair max keypoint distance."""
+    distances = []
+    remaining = list(range(len(test_poses)))
+    for ref in ref_poses:
+        if not remaining:
+            break
+        dists = [np.abs(ref[:, :2] - test_poses[j][:, :2]).max() for j in remaining]
+        best = int(np.argmin(dists))
+        distances.append(dists[best])
+        remaining.pop(best)
+    return distances
+
+def verify(images, tolerance, pose_ir, detector_ir):
+    hpes = {}
+    for backend in ("torch", "openvino"):
+        hpe = AlphaPoseHPE(input_src=images[0], device="CPU", backend=backend, pose_ir=pose_ir, detector_ir=detector_ir)
+        hpe.load_model()
+        hpes[backend] = hpe
+
+    ok = True
+    for image_file in images:
+        img = cv2.imread(image_file)
+        h, w = img.shape[:2]
+        poses = {}
+        for backend, hpe in hpes.items():
+            hpe.img_h, hpe.img_w = h, w
+            hpe.set_padding()
+            # Keypoints come back normalized, compare them in pixels
+            poses[backend] = [p[:, :2] * np.array([w, h]) for p in hpe.run_model(img).keypoints]
+
+        distances = match_poses(poses["torch"], poses["openvino"])
+        max_dist = max(distances) if distances else 0.0
+        same_count = len(poses["torch"]) == len(poses["openvino"])
+        passed = same_count and max_dist <= tolerance
+        ok = ok and passed
+        print(f"{os.path.basename(image_file)}: torch {len(poses['torch'])} poses, openvino {len(poses['openvino'])} poses, "
+              f"max keypoint diff {max_dist:.2f}px -> {'OK' if passed else 'MISMATCH'}")
+
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cfg", type=str, default=DEFAULT_CFG, help="AlphaPose config file (default=%(default)s)")
+    parser.add_argument("--checkpoint", type=str, default=DEFAULT_CHECKPOINT, help="FastPose checkpoint (default=%(default)s)")
+    parser.add_argument("--pose_ir", type=str, default=DEFAULT_POSE_IR, help="Output IR for the pose model (default=%(default)s)")
+    parser.add_argument("--detector_ir", type=str, default=DEFAULT_DETECTOR_IR, help="Output IR for the detector (default=%(default)s)")
+    parser.add_argument("--inp_dim", type=int, default=yolo_cfg.INP_DIM, help="Detector input size (default=%(default)s)")
+    parser.add_argument("--detbatch", type=int, default=1, help="Detector batch size (default=%(default)s)")
+    parser.add_argument("--verify", action="store_true", help="Compare torch and OpenVINO keypoints on the test images after export")
+    parser.add_argument("--images", type=str, default="unit_tests/images", help="Images used by --verify (default=%(default)s)")
+    parser.add_argument("--tolerance", type=float, default=2.0, help="Max allowed keypoint difference in pixels (default=%(default)s)")
+    args = parser.parse_args()
+
+    export_pose_model(args.cfg, args.checkpoint, args.pose_ir)
+    export_detector(args.inp_dim, args.detbatch, args.detector_ir)
+
+    if args.verify:
+        images = sorted(glob.glob(os.path.join(args.images, '*.[pj][pn]g')))
+        if not verify(images, args.tolerance, args.pose_ir, args.detector_ir):
+            print("Verification failed: OpenVINO keypoints differ from torch")
+            sys.exit(1)
+        print("Verification passed")
+
+if __name__ == "__main__":
+    main()
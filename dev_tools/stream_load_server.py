@@ -0,0 +1,233 @@
+"""
+Development-only MJPEG load-generation server for testing IP stream input under load.
+
+Serves several MJPEG endpoints at once, each with its own resolution and frame rate.
+Every endpoint's frames are JPEG encoded once at startup, so a client only costs a
+socket write per frame and the server can feed many HPE instances (e.g. --methods
+fan-out or several main.py processes) without becoming the bottleneck.
+
+Frames are paced on the endpoint clock like a live camera. A client that falls behind
+skips to the current frame. --jitter_ms delays frames randomly and --stall_every_s /
+--stall_ms inject stalls. Every client logs its delivered frame rate and bandwidth.
+
+Usage (from the repository root):
+    python3 dev_tools/stream_load_server.py --endpoint cam0:640x480@30 --endpoint cam1:1280x720@15
+    python3 dev_tools/stream_load_server.py --synthetic --endpoint cam0:1920x1080@60 --jitter_ms 5
+
+    python3 main.py --method movenet --input http://localhost:8080/cam0
+
+Do NOT deploy in production.
+"""
+
+import argparse
+import random
+import re
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+import numpy as np
+
+BOUNDARY = b"frame"
+ENDPOINT_PATTERN = re.compile(r"^(\w+):(\d+)x(\d+)@(\d+(?:\.\d+)?)$")
+
+class Endpoint:
+    """One MJPEG stream: a cache of complete multipart parts (headers + JPEG), paced at fps."""
+
+    def __init__(self, name, width, height, fps, parts):
+        self.name = name
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.parts = parts
+        self.start = time.perf_counter()
+
+    def index_at(self, now):
+        """Number of frames the endpoint clock has produced by now."""
+        return int((now - self.start) * self.fps)
+
+    def due_time(self, index):
+        return self.start + index / self.fps
+
+def parse_endpoint(spec):
+    match = ENDPOINT_PATTERN.match(spec)
+    if not match:
+        raise argparse.ArgumentTypeError(f"Invalid endpoint: {spec}, expected NAME:WIDTHxHEIGHT@FPS, e.g. cam0:640x480@30")
+    name, width, height, fps = match.groups()
+    return name, int(width), int(height), float(fps)
+
+def read_source_frames(path, max_frames):
+    cap = cv2.VideoCapture(path)
+    frames = []
+    while len(frames) < max_frames:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        frames.append(frame)
+    cap.release()
+    if not frames:
+        raise ValueError(f"No frames could be read from {path}")
+    return frames
+
+def synthetic_frames(width, height, count):
+    """Moving figure on a gradient with the frame number, so every frame is distinct."""
+    gradient = np.tile(np.linspace(40, 200, width, dtype=np.uint8), (height, 1))
+    base = cv2.merge([gradient, gradient[::-1], np.full_like(gradient, 90)])
+    frames = []
+    for i in range(count):
+        frame = base.copy()
+        phase = 2 * np.pi * i / count
+        center = (int(width / 2 + width / 3 * np.cos(phase)), int(height / 2 + height / 4 * np.sin(2 * phase)))
+        radius = max(4, height // 12)
+        cv2.circle(frame, center, radius, (255, 255, 255), -1)
+        cv2.line(frame, center, (center[0], min(height - 1, center[1] + 4 * radius)), (255, 255, 255), max(2, radius // 3))
+        cv2.putText(frame, f"{i:05d}", (10, max(30, height // 10)), cv2.FONT_HERSHEY_SIMPLEX, max(0.8, height / 480), (0, 0, 0), 2)
+        frames.append(frame)
+    return frames
+
+def encode_parts(frames, width, height, jpeg_quality):
+    """JPEG encodes the frames at the endpoint resolution, wrapped as multipart parts."""
+    parts = []
+    for frame in frames:
+        if frame.shape[1] != width or frame.shape[0] != height:
+            frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+        ok, jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality])
+        if not ok:
+            raise ValueError("JPEG encoding failed")
+        jpeg = jpeg.tobytes()
+        parts.append(b"--" + BOUNDARY + b"\r\nContent-Type: image/jpeg\r\nContent-Length: "
+                     + str(len(jpeg)).encode() + b"\r\n\r\n" + jpeg + b"\r\n")
+    return parts
+
+def build_endpoints(args):
+    endpoints = {}
+    source_frames = None if args.synthetic else read_source_frames(args.source, args.max_frames)
+    encoded = {}   # (width, height) -> parts, shared by endpoints of the same resolution
+    for name, width, height, fps in args.endpoint or [("video_feed", 640, 480, 25.0)]:
+        if name in endpoints:
+            raise ValueError(f"Duplicate endpoint name: {name}")
+        if (width, height) not in encoded:
+            start = time.perf_counter()
+            frames = source_frames or synthetic_frames(width, height, args.max_frames)
+            encoded[(width, height)] = encode_parts(frames, width, height, args.jpeg_quality)
+            parts = encoded[(width, height)]
+            mean_kb = sum(len(p) for p in parts) / len(parts) / 1024
+            print(f"[INFO] Encoded {len(parts)} frames at {width}x{height} in {time.perf_counter() - start:.1f}s, "
+                  f"{mean_kb:.1f}KB per frame")
+        endpoints[name] = Endpoint(name, width, height, fps, encoded[(width, height)])
+    return endpoints
+
+class StreamHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.0"
+
+    def log_message(self, format, *args):
+        pass   # per-client rates are logged instead of every request
+
+    def do_GET(self):
+        endpoints = self.server.endpoints
+        endpoint = endpoints.get(self.path.strip("/").split("?")[0])
+        if endpoint is None:
+            links = "".join(f'<li><a href="/{e.name}">/{e.name}</a> {e.width}x{e.height}@{e.fps:g}</li>' for e in endpoints.values())
+            body = f"<html><body><ul>{links}</ul></body></html>".encode()
+            self.send_response(200 if self.path == "/" else 404)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "multipart/x-mixed-replace; boundary=" + BOUNDARY.decode())
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.stream(endpoint)
+
+    def stream(self, endpoint):
+        options = self.server.options
+        client = f"{endpoint.name} {self.client_address[0]}:{self.client_address[1]}"
+        print(f"[INFO] {client} connected")
+
+        rng = random.Random()
+        # Probability of a stall after a frame, for one stall every stall_every_s seconds on average
+        stall_chance = 1 / (options.stall_every_s * endpoint.fps) if options.stall_every_s else 0
+
+        index = endpoint.index_at(time.perf_counter())
+        sent = skipped = stalls = 0
+        sent_bytes = 0
+        connected = log_time = time.perf_counter()
+        log_sent, log_bytes = 0, 0
+        try:
+            while True:
+                due = endpoint.due_time(index)
+                if options.jitter_ms:
+                    due += rng.uniform(0, options.jitter_ms) / 1000
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+
+                part = endpoint.parts[index % len(endpoint.parts)]
+                self.wfile.write(part)
+                sent += 1
+                sent_bytes += len(part)
+
+                if stall_chance and rng.random() < stall_chance:
+                    stalls += 1
+                    time.sleep(options.stall_ms / 1000)
+
+                # A client more than one frame behind the clock continues at the current frame
+                now = time.perf_counter()
+                current = endpoint.index_at(now)
+                if current > index + 1:
+                    skipped += current - index - 1
+                    index = current
+                else:
+                    index += 1
+
+                if now - log_time >= options.log_interval_s:
+                    interval = now - log_time
+                    print(f"[INFO] {client}: {(sent - log_sent) / interval:.1f} fps "
+                          f"(target {endpoint.fps:g}), {(sent_bytes - log_bytes) * 8 / interval / 1e6:.1f} Mbit/s, "
+                          f"{sent} frames, {skipped} skipped, {stalls} stalls")
+                    log_time, log_sent, log_bytes = now, sent, sent_bytes
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+        duration = time.perf_counter() - connected
+        print(f"[INFO] {client} disconnected after {duration:.1f}s: {sent} frames ({sent / duration if duration else 0:.1f} fps), "
+              f"{sent_bytes / 2**20:.1f}MB, {skipped} skipped, {stalls} stalls")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoint", type=parse_endpoint, action="append",
+                        help="Stream as NAME:WIDTHxHEIGHT@FPS, served at /NAME; repeat for several (default: video_feed:640x480@25)")
+    parser.add_argument("--source", type=str, default="unit_tests/video/giphy.gif", help="Video looped by all endpoints (default=%(default)s)")
+    parser.add_argument("--synthetic", action="store_true", help="Generate a moving test pattern instead of reading --source")
+    parser.add_argument("--max_frames", type=int, default=300, help="Frames cached per resolution (default=%(default)s)")
+    parser.add_argument("--jpeg_quality", type=int, default=90, help="JPEG quality of the cached frames (default=%(default)s)")
+    parser.add_argument("--jitter_ms", type=float, default=0, help="Delay every frame by a random 0..N ms (default=%(default)s)")
+    parser.add_argument("--stall_every_s", type=float, default=0, help="Stall a client on average every N seconds (default=%(default)s, never)")
+    parser.add_argument("--stall_ms", type=float, default=500, help="Length of a stall (default=%(default)s)")
+    parser.add_argument("--log_interval_s", type=float, default=5, help="Seconds between per-client rate logs (default=%(default)s)")
+    parser.add_argument("--host", type=str, default="0.0.0.0", help="(default=%(default)s)")
+    parser.add_argument("--port", type=int, default=8080, help="(default=%(default)s)")
+    args = parser.parse_args()
+
+    endpoints = build_endpoints(args)
+
+    server = ThreadingHTTPServer((args.host, args.port), StreamHandler)
+    server.daemon_threads = True
+    server.endpoints = endpoints
+    server.options = args
+    for e in endpoints.values():
+        e.start = time.perf_counter()
+        print(f"[INFO] Serving http://{args.host}:{args.port}/{e.name} ({e.width}x{e.height}@{e.fps:g})")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+import multiprocessing as mp
+import os
+import queue
+import time
+import traceback
+
+import numpy as np
+
+from utils.frame_reader import FrameReader
+from utils.shared_frame_buffer import SharedFrameRingBuffer
+
+# Seconds between checks that a worker is still alive while waiting for a free slot
+WORKER_POLL_S = 1.0
+
+class FrameSource:
+    """
+    Receiving end of the frames the fan-out process reads for one method (the frame_source
+    argument of BaseHPE, in place of its FrameReader). Describes the input (type, size, fps)
+    and yields (frame, frame_number, univ_time, source file) from a shared memory ring, with
+    grab_start/grab_end of the frame as read by the fan-out process.
+
+    Slots are flat byte buffers sized for the first frame; smaller frames use a part of
+    the slot, larger ones (directories of differently sized images) are pickled with the
+    frame info instead. A frame is only valid until the next one is requested.
+    """
+
+    def __init__(self, ring, input_type, img_w, img_h, video_fps):
+        self.ring = ring
+        self.input_type = input_type
+        self.img_w = img_w
+        self.img_h = img_h
+        self.video_fps = video_fps
+        self.grab_start = None
+        self.grab_end = None
+        self.view = None
+        self.received = 0
+
+    # --resume is not supported with --methods, resume_state is only accepted for the FrameReader interface
+    def frames(self, resume_state=None, skip=None):
+        print("[INFO] Receiving the frames from the fan-out process")
+        while True:
+            item = self.ring.read()
+            if item is None:
+                break
+            slot, view, frame_number, grab_end, (shape, grab_start, univ_time, source, frame) = item
+            self.grab_start, self.grab_end = grab_start, grab_end
+            self.received += 1
+
+            # Live inputs: the deadlines of the frame scheduler count from the grab in the fan-out process
+            if not (skip and skip(frame_number, grab_start, grab_end)):
+                if frame is None:
+                    frame = view[:int(np.prod(shape))].reshape(shape)
+                self.view = view
+                yield frame, frame_number, univ_time, source
+
+            frame = view = self.view = None
+            self.ring.release(slot)
+
+    # True if frame is a view on the current slot, which is reused for a later frame
+    def reuses_memory(self, frame):
+        return self.view is not None and np.shares_memory(frame, self.view)
+
+    # After the HPE is done with the last frame, which is a view on the shared block
+    def close(self):
+        self.ring.close()
+
+class MethodWorker:
+    """Process running one HPE method on the frames of the fan-out process."""
+
+    def __init__(self, ctx, method, create_hpe, ring_slots, frame_nbytes, input_type, img_w, img_h, video_fps, results):
+        self.method = method
+        self.ring = SharedFrameRingBuffer(ring_slots, (max(frame_nbytes, 1),), ctx=ctx)
+        source = FrameSource(self.ring, input_type, img_w, img_h, video_fps)
+        self.process = ctx.Process(target=_method_worker, args=(create_hpe, method, source, results), name=f"hpe-{method}")
+        self.process.start()
+
+        self.undelivered = 0    # live input: frames skipped because the method was still busy
+        self.failed = False
+
+    def send(self, frame, frame_number, grab_start, grab_end, univ_time, source, wait):
+        """Copies the frame into a free slot. Without wait, the frame is skipped if none is free."""
+        slot = None
+        while slot is None:
+            slot, view = self.ring.acquire(timeout=WORKER_POLL_S if wait else 0)
+            if slot is None and (not wait or not self.process.is_alive()):
+                if not self.process.is_alive():
+                    self.failed = True
+                self.undelivered += 1
+                return
+
+        if frame.nbytes <= view.nbytes:
+            np.copyto(view[:frame.nbytes].reshape(frame.shape), frame)
+            pickled = None
+        else:
+            pickled = frame
+        self.ring.commit(slot, frame_number, grab_end, (frame.shape, grab_start, univ_time, source, pickled))
+
+    def close(self):
+        self.ring.end_stream()
+        self.process.join()
+        self.ring.close()
+
+class FanOutHPE:
+    """
+    Multi-method mode: the input is read once, here, and every frame is handed to one
+    worker process per method (through a shared memory ring each), so the methods run at the
+    same time on the same frames. Each worker is a regular HPE instance with its own outputs
+    under <output_dir>/<method> and its own timings; this process only reads and sends frames.
+
+    Images, directories and videos are delivered completely, waiting for the slowest method.
+    Live inputs are never held up: a method that is still busy skips the frame.
+
+    create_hpe(method, frame_source) builds the HPE of a method in the worker process; it has
+    to be picklable (a module level function or functools.partial of one).
+    """
+
+    def __init__(self, methods, create_hpe, input_src, ring_slots=4):
+        self.methods = list(methods)
+        self.create_hpe = create_hpe
+        self.ring_slots = ring_slots
+        self.reader = FrameReader(input_src)
+        self.input_file = os.path.basename(os.path.normpath(str(input_src)))
+        self.live = self.reader.input_type in ("webcam", "ip_stream")
+        self.workers = []
+
+    def load_model(self):
+        # Workers are spawned, the models are loaded in the worker processes at the same time
+        self.ctx = mp.get_context("spawn")
+        self.results = self.ctx.Queue()
+
+        # The rings of a directory are sized for its first image, see main_loop()
+        if self.reader.input_type == "image":
+            self.start_workers(self.reader.img.shape)
+        elif self.reader.input_type != "directory":
+            self.start_workers((self.reader.img_h, self.reader.img_w, 3))
+
+    def start_workers(self, frame_shape):
+        frame_nbytes = int(np.prod(frame_shape))
+        for method in self.methods:
+            self.workers.append(MethodWorker(self.ctx, method, self.create_hpe, self.ring_slots, frame_nbytes,
+                                             self.reader.input_type, frame_shape[1], frame_shape[0],
+                                             self.reader.video_fps, self.results))
+        print(f"[INFO] Fan-out: decoding {self.input_file} once for {', '.join(self.methods)}")
+        self.fanout_start = time.time()
+
+    def main_loop(self):
+        try:
+            for frame, frame_number, univ_time, source in self.reader.frames():
+                if not self.workers:
+                    self.start_workers(frame.shape)
+
+                for worker in self.workers:
+                    if not worker.failed:
+                        worker.send(frame, frame_number, self.reader.grab_start, self.reader.grab_end,
+                                    univ_time, source, wait=not self.live)
+        finally:
+            self.close_workers()
+
+    def close_workers(self):
+        for worker in self.workers:
+            worker.close()
+
+        # Every worker reports (method, frames, seconds, error) before it exits
+        reports = {}
+        for _ in self.workers:
+            try:
+                method, frames, seconds, error = self.results.get(timeout=WORKER_POLL_S)
+            except queue.Empty:
+                break
+            reports[method] = (frames, seconds, error)
+
+        if self.workers:
+            print(f"[INFO] Fan-out finished in {time.time() - self.fanout_start:.1f}s")
+        for worker in self.workers:
+            frames, seconds, error = reports.get(worker.method, (0, 0, "worker exited without a report"))
+            if error:
+                print(f"[ERROR] {worker.method} failed:\n{error}")
+                continue
+            fps = frames / seconds if seconds else 0.0
+            skipped = f", {worker.undelivered} frames skipped while busy" if worker.undelivered else ""
+            print(f"[INFO] {worker.method}: {frames} frames in {seconds:.1f}s ({fps:.1f} fps){skipped}")
+
+def _method_worker(create_hpe, method, frame_source, results):
+    try:
+        hpe = create_hpe(method, frame_source)
+        hpe.load_model()
+        start = time.time()
+        hpe.main_loop()
+        seconds = time.time() - start
+        del hpe
+        frame_source.close()
+        results.put((method, frame_source.received, seconds, None))
+    except BaseException:
+        results.put((method, frame_source.received, 0, traceback.format_exc()))
+        raise
@@ -3,41 +3,110 @@ import sys
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 import argparse
-from movenet_hpe import MoveNetHPE
-from openvino_base_hpe import OpenVINOBaseHPE
-from alphapose_hpe import AlphaPoseHPE
+import copy
+import functools
+from utils.resources import ResourcePartition
+
+METHODS = ['openpose', 'alphapose', 'movenet', 'hrnet', 'ae1', 'ae2', 'ae3']
 
 def main():
     parser = parse_arguments()
     args = parser.parse_args()
+    check_arguments(parser, args)
+
+    # Before get_hpe_method() imports numpy, torch and OpenCV, so their thread pools see the limits
+    partition = ResourcePartition.from_args(args.cpus, args.cpu_share, args.threads)
+    if partition:
+        partition.apply_environment()
+        partition.apply_libraries()
+        args.ov_threads = args.ov_threads or partition.threads
+        args.torch_threads = args.torch_threads or partition.threads
+        partition.report()
 
-    hpe = get_hpe_method(args)
+    hpe = get_fanout_method(args) if args.methods else get_hpe_method(args)
     hpe.load_model()
     hpe.main_loop()
 
 def parse_arguments():
         parser = argparse.ArgumentParser()
-        parser.add_argument('--method', type=str, required=True, choices=['openpose', 'alphapose', 'movenet', 'hrnet', 'ae1', 'ae2', 'ae3'])
+        parser.add_argument('--method', type=str, choices=METHODS)
+        parser.add_argument('--methods', type=str, help="Comma separated methods run at the same time on frames decoded once, each with its outputs in <output_dir>/<method>, e.g. movenet,ae1,openpose")
         parser.add_argument('--input', type=str, default='0', help="Path to video or image file to use as input (default=%(default)s)")
         parser.add_argument("--output_dir", type=str, help="Path to directory where output files will be saved")          
         parser.add_argument("--json", action="store_true", help="Enable export keypoints to a single json file")
         parser.add_argument("--csv", action="store_true", help="Enable export keypoints to a single csv file")
         parser.add_argument("--measurement_interval_ms", type=int, default=100, help="Interval in ms for measuring transmitted data volume per interval")
+        parser.add_argument("--segment_frames", type=int, help="Split the json/csv exports into segments of this many frames, indexed by a manifest")
+        parser.add_argument("--segment_minutes", type=float, help="Split the json/csv exports into segments of this many minutes, indexed by a manifest")
+        parser.add_argument("--checkpoint_frames", type=int, help="Directory/video: save the json/csv results and a checkpoint every N frames")
+        parser.add_argument("--resume", action="store_true", help="Directory/video: continue after the checkpoint in --output_dir instead of starting from the first frame")
+        parser.add_argument("--result_cache", type=str, help="Directory of an on-disk cache of model outputs, reused when the same images are processed again with the same settings")
+        parser.add_argument("--result_cache_mb", type=int, default=1024, help="Size limit of --result_cache in MB, least recently used entries are removed (default=%(default)s)")
+        parser.add_argument("--motion_threshold", type=float, help="Reuse the previous poses for frames whose downscaled gray image changed by at most this many gray levels per block since the last inference")
+        parser.add_argument("--motion_max_interval", type=int, default=30, help="Run inference at least every N frames with --motion_threshold (default=%(default)s)")
         parser.add_argument("--save_video", action="store_true", help="Save resutls into a video file")
         parser.add_argument("--save_image", action="store_true", help="Save image with keypoints")
-        parser.add_argument('--device', type=str, default="GPU", choices=['GPU', 'CPU'], help="Device to run inference on. Options: CPU, GPU")
+        parser.add_argument("--output_queue_size", type=int, default=64, help="Max number of rendered frames waiting to be encoded/written (default=%(default)s)")
+        parser.add_argument("--output_full_policy", type=str, default="block", choices=['block', 'drop'], help="What to do with a rendered frame when the output queue is full (default=%(default)s)")
+        parser.add_argument("--encode_workers", type=int, default=2, help="Number of background JPEG encoding workers for --save_image (default=%(default)s)")
+        parser.add_argument("--jpeg_quality", type=int, default=95, help="JPEG quality for --save_image (default=%(default)s)")
+        parser.add_argument("--alphapose_backend", type=str, default="torch", choices=['torch', 'openvino'], help="Runtime for the AlphaPose pose model and detector (default=%(default)s)")
+        parser.add_argument("--torch_threads", "--torch-threads", type=int, help="Number of torch intra-op threads for AlphaPose (default: torch default)")
+        parser.add_argument("--torch_perf", action="store_true", help="AlphaPose: use torch.inference_mode and channels-last memory format")
+        parser.add_argument("--bf16", action="store_true", help="AlphaPose: run the pose model and detector under bf16 autocast (if the CPU supports it)")
+        parser.add_argument("--torch_compile", action="store_true", help="AlphaPose: compile the pose model and detector with torch.compile")
+        parser.add_argument("--pose_nms", action="store_true", help="AlphaPose: merge duplicate poses of overlapping detections with parametric pose NMS")
+        parser.add_argument("--frame_budget_ms", type=float, help="Webcam/IP stream: latency budget per frame from capture; frames that cannot meet it are dropped")
+        parser.add_argument("--drop_policy", type=str, default="drop-oldest", choices=['drop-oldest', 'every-nth', 'adaptive'], help="Which frames to drop under --frame_budget_ms (default=%(default)s)")
+        parser.add_argument("--keep_every", type=int, default=2, help="Process every Nth frame with --drop_policy every-nth (default=%(default)s)")
+        parser.add_argument("--roi", action="store_true", help="Run inference on the region around the previous frame's people instead of the whole frame (video/webcam/stream)")
+        parser.add_argument("--roi_margin", type=float, default=0.2, help="Margin added around the people region, as a fraction of its size (default=%(default)s)")
+        parser.add_argument("--roi_refresh", type=int, default=10, help="Process the whole frame every N frames with --roi, to find new people (default=%(default)s)")
+        parser.add_argument("--roi_config", type=str, help="Json file with a static 'roi' box and 'exclude' boxes in frame pixels")
+        parser.add_argument("--ae_matcher", type=str, default="hungarian", choices=['hungarian', 'greedy'], help="hrnet/ae1-3: how joints are grouped into people by their tags (default=%(default)s)")
+        parser.add_argument("--ae_refine_window", type=float, default=0.0, help="hrnet/ae1-3: search missing joints within this fraction of the pose size around the pose instead of the whole heatmap (default=%(default)s, whole heatmap)")
+        parser.add_argument("--decode_workers", type=int, default=0, help="openpose/hrnet/ae1-3: decode poses in this many worker processes, overlapping with inference of the next frame (default=%(default)s, decode inline)")
+        parser.add_argument("--model_pool_size", type=int, default=4, help="Max number of compiled input shapes kept per OpenVINO model (default=%(default)s)")
+        parser.add_argument("--target_latency_ms", type=float, help="Enable adaptive input resolution, switching input sizes to keep the per-frame latency below this target")
+        parser.add_argument("--resolution_scales", type=str, default="0.6,0.8,1.0", help="Comma separated scales of the default input size used by adaptive resolution (default=%(default)s)")
+        parser.add_argument('--device', type=str, default="GPU", help="Device to run inference on: CPU or GPU, and for the OpenVINO models also e.g. GPU.1, NPU, AUTO, AUTO:GPU,CPU, MULTI:GPU,CPU, HETERO:GPU,CPU (default=%(default)s)")
+        parser.add_argument("--ov_hint", type=str, choices=['LATENCY', 'THROUGHPUT', 'CUMULATIVE_THROUGHPUT'], help="OpenVINO PERFORMANCE_HINT (default: plugin default)")
+        parser.add_argument("--ov_streams", type=int, help="OpenVINO NUM_STREAMS (default: from the hint)")
+        parser.add_argument("--ov_threads", type=int, help="OpenVINO INFERENCE_NUM_THREADS of the CPU (default: all cores)")
+        parser.add_argument("--ov_infer_requests", type=int, default=0, help="Number of OpenVINO infer requests of openpose/hrnet/ae1-3 (default=%(default)s, optimal number + 1)")
+        parser.add_argument("--cpus", type=str, help="Pin the process to these cores, e.g. 0-3,8, and size the OpenVINO, torch, OpenCV and BLAS thread pools to them")
+        parser.add_argument("--cpu_share", type=str, help="Like --cpus with the K-th of N equal slices of the available cores, e.g. 2/4")
+        parser.add_argument("--threads", type=int, help="Threads per library with --cpus/--cpu_share (default: number of cores); --ov_threads and --torch_threads take precedence")
         
         return parser
 
+def check_arguments(parser, args):
+    if bool(args.method) == bool(args.methods):
+        parser.error("one of --method or --methods is required")
+    if args.methods:
+        methods = args.methods.split(',')
+        unknown = [m for m in methods if m not in METHODS]
+        if unknown or len(set(methods)) != len(methods):
+            parser.error(f"--methods takes distinct methods from {METHODS}, got {args.methods}")
+        if "alphapose" in methods:
+            parser.error("alphapose is not supported with --methods, its detection loader reads the input itself")
+        if args.resume:
+            parser.error("--resume is not supported with --methods")
+
 def get_hpe_method(args):
+    # Imported here rather than at the top, so the resource partition of main() applies to them
+    from movenet_hpe import MoveNetHPE
+    from openvino_base_hpe import OpenVINOBaseHPE
+    from alphapose_hpe import AlphaPoseHPE
+
     method_map = {
-        'movenet': lambda args: MoveNetHPE(device=args.device, **base_args(args)),
-        'alphapose': lambda args: AlphaPoseHPE(device=args.device, **base_args(args)),
-        'openpose': lambda args: OpenVINOBaseHPE(model_type='openpose', device=args.device, **base_args(args)),
-        'hrnet': lambda args: OpenVINOBaseHPE(model_type='higherhrnet', device=args.device, **base_args(args)),
-        'ae1': lambda args: OpenVINOBaseHPE(model_type='efficienthrnet1', device=args.device, **base_args(args)),
-        'ae2': lambda args: OpenVINOBaseHPE(model_type='efficienthrnet2', device=args.device, **base_args(args)),
-        'ae3': lambda args: OpenVINOBaseHPE(model_type='efficienthrnet3', device=args.device, **base_args(args)),
+        'movenet': lambda args: MoveNetHPE(device=args.device, **runtime_args(args), **base_args(args)),
+        'alphapose': lambda args: AlphaPoseHPE(device=args.device, **alphapose_args(args), **runtime_args(args), **base_args(args)),
+        'openpose': lambda args: OpenVINOBaseHPE(model_type='openpose', device=args.device, **openvino_args(args), **runtime_args(args), **base_args(args)),
+        'hrnet': lambda args: OpenVINOBaseHPE(model_type='higherhrnet', device=args.device, **openvino_args(args), **runtime_args(args), **base_args(args)),
+        'ae1': lambda args: OpenVINOBaseHPE(model_type='efficienthrnet1', device=args.device, **openvino_args(args), **runtime_args(args), **base_args(args)),
+        'ae2': lambda args: OpenVINOBaseHPE(model_type='efficienthrnet2', device=args.device, **openvino_args(args), **runtime_args(args), **base_args(args)),
+        'ae3': lambda args: OpenVINOBaseHPE(model_type='efficienthrnet3', device=args.device, **openvino_args(args), **runtime_args(args), **base_args(args)),
     }
 
     name = args.method.lower()
@@ -50,6 +119,48 @@ def get_hpe_method(args):
     else:
         return method_map[name](**base_args(args))
 
+# Decodes the input once and runs every method of --methods on it in a worker process
+def get_fanout_method(args):
+    from fanout_hpe import FanOutHPE
+    return FanOutHPE(methods=args.methods.split(','), create_hpe=functools.partial(create_method_hpe, args),
+                     input_src=args.input)
+
+# Runs in the worker process of a method, see fanout_hpe.py
+def create_method_hpe(args, method, frame_source):
+    method_args = copy.copy(args)
+    method_args.method = method
+    method_args.output_dir = os.path.join(args.output_dir or "out/", method)
+    method_args.frame_source = frame_source
+    return get_hpe_method(method_args)
+
+def openvino_args(args):
+    return {
+        "model_pool_size": args.model_pool_size,
+        "tag_matcher": args.ae_matcher,
+        "refine_window": args.ae_refine_window,
+        "decode_workers": args.decode_workers
+    }
+
+# OpenVINO runtime settings, applied to every method that runs OpenVINO models
+def runtime_args(args):
+    return {
+        "performance_hint": args.ov_hint,
+        "num_streams": args.ov_streams,
+        "num_threads": args.ov_threads,
+        "infer_requests": args.ov_infer_requests
+    }
+
+def alphapose_args(args):
+    return {
+        "backend": args.alphapose_backend,
+        "torch_threads": args.torch_threads,
+        "inference_mode": args.torch_perf,
+        "channels_last": args.torch_perf,
+        "bf16": args.bf16,
+        "compile_model": args.torch_compile,
+        "pose_nms": args.pose_nms
+    }
+
 def base_args(args):
     return {
         "input_src": args.input,
@@ -58,7 +169,29 @@ def base_args(args):
         "enable_csv": args.csv,
         "measurement_interval_ms": args.measurement_interval_ms,
         "save_image": args.save_image,
-        "save_video": args.save_video
+        "save_video": args.save_video,
+        "output_queue_size": args.output_queue_size,
+        "output_full_policy": args.output_full_policy,
+        "encode_workers": args.encode_workers,
+        "jpeg_quality": args.jpeg_quality,
+        "target_latency_ms": args.target_latency_ms,
+        "resolution_scales": [float(s) for s in args.resolution_scales.split(',')],
+        "frame_budget_ms": args.frame_budget_ms,
+        "drop_policy": args.drop_policy,
+        "keep_every": args.keep_every,
+        "roi_mode": args.roi,
+        "roi_margin": args.roi_margin,
+        "roi_refresh": args.roi_refresh,
+        "roi_config": args.roi_config,
+        "segment_frames": args.segment_frames,
+        "segment_minutes": args.segment_minutes,
+        "checkpoint_frames": args.checkpoint_frames,
+        "resume": args.resume,
+        "result_cache_dir": args.result_cache,
+        "result_cache_mb": args.result_cache_mb,
+        "motion_threshold": args.motion_threshold,
+        "motion_max_interval": args.motion_max_interval,
+        "frame_source": getattr(args, "frame_source", None)   # set for the workers of --methods
     }
 
 
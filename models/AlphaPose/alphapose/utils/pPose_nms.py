@@ -345,6 +345,88 @@ def pose_nms_body(bboxes, bbox_scores, bbox_ids, pose_preds, pose_scores, areaTh
 
     return res_bboxes, res_bbox_scores, res_bbox_ids, res_pose_preds, res_pose_scores, res_pick_ids
 
+def pose_nms_body_batched(bboxes, bbox_scores, bbox_ids, pose_preds, pose_scores, areaThres=0):
+    '''
+    Parametric Pose NMS algorithm, same results as pose_nms_body() with the pairwise
+    terms computed once for all poses instead of once per pick:
+        the parametric distance (get_parametric_distance) is symmetric, so it is one
+        [n, n] matrix; the PCK match count (PCK_match) only depends on the reference
+        distance of the picked pose, so it is one [n, n] matrix as well. The greedy
+        suppression then only walks the poses in score order, and all clusters are
+        merged at once (p_merge_fast on a [picks, n, kp_num] weight tensor).
+    bboxes:         bbox locations list (n, 4)
+    bbox_scores:    bbox scores list (n, 1)
+    bbox_ids:       bbox tracking ids list (n, 1)
+    pose_preds:     pose locations list (n, kp_num, 2)
+    pose_scores:    pose scores list    (n, kp_num, 1)
+    '''
+    pose_scores[pose_scores == 0] = 1e-5
+    res_bboxes, res_bbox_scores, res_bbox_ids, res_pose_preds, res_pose_scores, res_pick_ids = [],[],[],[],[],[]
+    nsamples = bboxes.shape[0]
+    if nsamples == 0:
+        return res_bboxes, res_bbox_scores, res_bbox_ids, res_pose_preds, res_pose_scores, res_pick_ids
+
+    widths = bboxes[:, 2] - bboxes[:, 0]
+    heights = bboxes[:, 3] - bboxes[:, 1]
+    ref_dists = alpha * torch.max(widths, heights)
+
+    # Keypoint distances between all pairs of poses [n, n, kp_num]
+    dist = torch.sqrt(torch.sum(torch.pow(pose_preds[:, None] - pose_preds[None, :], 2), dim=3))
+
+    # get_parametric_distance() of every pose to every other pose
+    kp_scores = pose_scores[:, :, 0]
+    score_dists = torch.tanh(kp_scores / delta1)[:, None] * torch.tanh(kp_scores / delta1)[None, :]
+    score_dists = score_dists * (dist <= 1)
+    simi = torch.sum(score_dists, dim=2) + mu * torch.sum(torch.exp(-dist / delta2), dim=2)
+
+    # PCK_match() with the reference distance of the row pose
+    pck_dists = torch.clamp(ref_dists, max=7)
+    num_match_keypoints = torch.sum(dist / pck_dists[:, None, None] <= 1, dim=2)
+
+    suppress = (simi > gamma) | (num_match_keypoints >= matchThreds)
+
+    # Greedy suppression in score order (stable, so ties go to the lower index like torch.argmax)
+    human_scores = pose_scores.mean(dim=1)[:, 0]
+    order = np.argsort(-human_scores.numpy(), kind='stable')
+    remaining = torch.ones(nsamples, dtype=torch.bool)
+    pick = []
+    clusters = []
+    for i in order:
+        if not remaining[i]:
+            continue
+        # A pose always matches itself (all keypoints at distance 0)
+        cluster = remaining & suppress[i]
+        cluster[i] = True
+        remaining &= ~cluster
+        pick.append(int(i))
+        clusters.append(cluster)
+    clusters = torch.stack(clusters)   # [picks, n]
+
+    # p_merge_fast() of all clusters: score weighted mean of the joints within the merge distance
+    merge_dists = torch.clamp(ref_dists[pick], max=15)
+    joint_mask = dist[pick] <= merge_dists[:, None, None]   # [picks, n, kp_num]
+    weights = (clusters[:, :, None] & joint_mask).float() * kp_scores[None]
+    normed = weights / torch.sum(weights, dim=1, keepdim=True)
+    merge_poses = torch.sum(pose_preds[None] * normed[..., None], dim=1)   # [picks, kp_num, 2]
+    merge_scores = torch.sum(weights * normed, dim=1)[..., None]           # [picks, kp_num, 1]
+
+    keep = (torch.max(pose_scores[pick, :, 0], dim=1).values >= scoreThreds) & \
+           (torch.max(merge_scores[:, :, 0], dim=1).values >= scoreThreds)
+    extents = merge_poses.max(dim=1).values - merge_poses.min(dim=1).values
+    keep &= ~(1.5 ** 2 * extents[:, 0] * extents[:, 1] < areaThres)
+
+    for j in torch.nonzero(keep)[:, 0].tolist():
+        res_bboxes.append(bboxes[pick[j]].cpu().tolist())
+        res_bbox_scores.append(bbox_scores[pick[j]].cpu())
+        merge_id = torch.nonzero(clusters[j])[:, 0]
+        # pose_nms_body() indexes single pose clusters with a scalar, which drops a dimension
+        res_bbox_ids.append(bbox_ids[merge_id[0] if len(merge_id) == 1 else merge_id].tolist())
+        res_pose_preds.append(merge_poses[j])
+        res_pose_scores.append(merge_scores[j])
+        res_pick_ids.append(pick[j])
+
+    return res_bboxes, res_bbox_scores, res_bbox_ids, res_pose_preds, res_pose_scores, res_pick_ids
+
 def pose_nms_fullbody(bboxes, bbox_scores, bbox_ids, pose_preds, pose_scores, areaThres=0):
     '''
     Parametric Pose NMS algorithm
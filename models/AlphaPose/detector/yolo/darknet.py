@@ -307,6 +307,8 @@ class Darknet(nn.Module):
         self.net_info, self.module_list = create_modules(self.blocks)
         self.header = torch.IntTensor([0,0,0,0])
         self.seen = 0
+        self.plan = self.build_plan()
+        self.grid_cache = {}
 
         
         
@@ -316,91 +318,110 @@ class Darknet(nn.Module):
     def get_module_list(self):
         return self.module_list
 
-                
+    def build_plan(self):
+        """
+        Precompute the execution plan once: the layer type, the absolute indices of the
+        route/shortcut inputs and, for every step, which cached outputs are no longer
+        needed afterwards. Only outputs referenced by a later route/shortcut are kept.
+        """
+        modules = self.blocks[1:]
+        plan = []
+        last_use = {}
+        for i, block in enumerate(modules):
+            module_type = block["type"]
+            inputs = []
+            info = {}
+            if module_type == "route":
+                layers = [int(a) for a in block["layers"]]
+                # Positive indices are absolute, negative are relative to the current layer
+                inputs = [l if l > 0 else i + l for l in layers]
+            elif module_type == "shortcut":
+                inputs = [i - 1, i + int(block["from"])]
+            elif module_type == "yolo":
+                info["anchors"] = self.module_list[i][0].anchors
+                info["num_classes"] = int(block["classes"])
+            elif module_type not in ("convolutional", "upsample", "maxpool"):
+                raise ValueError(f"Unknown Darknet layer type: {module_type}")
+
+            for j in inputs:
+                last_use[j] = i
+            plan.append((i, module_type, inputs, info))
+
+        keep = set(last_use.keys())
+        free_after = [[] for _ in modules]
+        for j, i in last_use.items():
+            free_after[i].append(j)
+
+        return [(i, module_type, inputs, info, i in keep, free_after[i])
+                for (i, module_type, inputs, info) in plan]
+
+    def yolo_grid(self, i, grid_size, stride, anchors, device):
+        # Grid offsets and scaled anchors only depend on the layer and the input size
+        key = (i, grid_size, stride, device)
+        if key not in self.grid_cache:
+            num_anchors = len(anchors)
+            grid_len = np.arange(grid_size)
+            a, b = np.meshgrid(grid_len, grid_len)
+            x_offset = torch.FloatTensor(a).view(-1, 1)
+            y_offset = torch.FloatTensor(b).view(-1, 1)
+            x_y_offset = torch.cat((x_offset, y_offset), 1).repeat(1, num_anchors).view(-1, 2).unsqueeze(0).to(device)
+            scaled_anchors = torch.FloatTensor([(a[0] / stride, a[1] / stride) for a in anchors])
+            scaled_anchors = scaled_anchors.repeat(grid_size * grid_size, 1).unsqueeze(0).to(device)
+            self.grid_cache[key] = (x_y_offset, scaled_anchors)
+        return self.grid_cache[key]
+
+    def decode_yolo(self, i, prediction, inp_dim, anchors, num_classes):
+        # Same transform as util.predict_transform, with the grids taken from the cache
+        batch_size = prediction.size(0)
+        stride = inp_dim // prediction.size(2)
+        grid_size = inp_dim // stride
+        bbox_attrs = 5 + num_classes
+        num_anchors = len(anchors)
+
+        prediction = prediction.view(batch_size, bbox_attrs * num_anchors, grid_size * grid_size)
+        prediction = prediction.transpose(1, 2).contiguous()
+        prediction = prediction.view(batch_size, grid_size * grid_size * num_anchors, bbox_attrs)
+
+        x_y_offset, scaled_anchors = self.yolo_grid(i, grid_size, stride, anchors, prediction.device)
+
+        # Sigmoid the centre x/y, the object confidence and the class scores
+        prediction[:, :, :2] = torch.sigmoid(prediction[:, :, :2]) + x_y_offset
+        prediction[:, :, 4:bbox_attrs] = torch.sigmoid(prediction[:, :, 4:bbox_attrs])
+        # Log space transform of height and width
+        prediction[:, :, 2:4] = torch.exp(prediction[:, :, 2:4]) * scaled_anchors
+        prediction[:, :, :4] *= stride
+        return prediction
+
     def forward(self, x, args):
         detections = []
-        modules = self.blocks[1:]
-        outputs = {}   #We cache the outputs for the route layer
-        
-        
-        write = 0
-        for i in range(len(modules)):        
-            
-            module_type = (modules[i]["type"])
-            if module_type == "convolutional" or module_type == "upsample" or module_type == "maxpool":
-                
+        outputs = {}   # only the outputs still needed by a later route/shortcut layer
+        inp_dim = int(self.net_info["height"])
+
+        for i, module_type, inputs, info, keep, free_after in self.plan:
+            if module_type == "route":
+                if len(inputs) == 1:
+                    x = outputs[inputs[0]]
+                else:
+                    x = torch.cat([outputs[j] for j in inputs], 1)
+
+            elif module_type == "shortcut":
+                x = outputs[inputs[0]] + outputs[inputs[1]]
+
+            elif module_type == "yolo":
+                # Decoded in fp32, also under bf16 autocast. x stays the input of the layer
+                prediction = x.data.float().to(args.device)
+                detections.append(self.decode_yolo(i, prediction, inp_dim, info["anchors"], info["num_classes"]))
+
+            else:
                 x = self.module_list[i](x)
-                outputs[i] = x
 
-                
-            elif module_type == "route":
-                layers = modules[i]["layers"]
-                layers = [int(a) for a in layers]
-                
-                if (layers[0]) > 0:
-                    layers[0] = layers[0] - i
-
-                if len(layers) == 1:
-                    x = outputs[i + (layers[0])]
-
-                elif len(layers) == 2:
-                    if (layers[1]) > 0:
-                        layers[1] = layers[1] - i
-                        
-                    map1 = outputs[i + layers[0]]
-                    map2 = outputs[i + layers[1]]
-
-                    x = torch.cat((map1, map2), 1)
-                elif len(layers) == 4:  # SPP
-                    map1 = outputs[i + layers[0]]
-                    map2 = outputs[i + layers[1]]
-                    map3 = outputs[i + layers[2]]
-                    map4 = outputs[i + layers[3]]
-
-                    x = torch.cat((map1, map2, map3, map4), 1)
+            if keep:
                 outputs[i] = x
-            
-            elif  module_type == "shortcut":
-                from_ = int(modules[i]["from"])
-                x = outputs[i-1] + outputs[i+from_]
-                outputs[i] = x
-                
-            
-            
-            elif module_type == 'yolo':        
-                
-                anchors = self.module_list[i][0].anchors
-                #Get the input dimensions
-                inp_dim = int (self.net_info["height"])
-                
-                #Get the number of classes
-                num_classes = int (modules[i]["classes"])
-                
-                #Output the result
-                x = x.data.to(args.device)
-                x = predict_transform(x, inp_dim, anchors, num_classes, args)
-                
-                if type(x) == int:
-                    continue
+            for j in free_after:
+                del outputs[j]
 
-                
-                if not write:
-                    detections = x
-                    write = 1
-                
-                else:
-                    detections = torch.cat((detections, x), 1)
-                
-                outputs[i] = outputs[i-1]
-                
-        
-        
-        try:
-            return detections
-        except:
-            return 0
+        return torch.cat(detections, 1)
 
-            
     def load_weights(self, weightfile):
         
         #Open the weights file
@@ -9,6 +9,7 @@ import sys
 sys.path.insert(0, os.path.dirname(__file__))
 from abc import ABC, abstractmethod
 import platform
+import time
 
 import torch
 import numpy as np
@@ -19,6 +20,7 @@ from yolo.util import unique
 from yolo.bbox import bbox_iou
 
 from .apis import BaseDetector
+from utils.weights_cache import is_cache_valid
 
 #only windows visual studio 2013 ~2017 support compile c/cuda extensions
 #If you force to compile extension on Windows and ensure appropriate visual studio
@@ -41,6 +43,8 @@ class YOLODetector(BaseDetector):
         # Set the paths relative to the script directory
         self.model_cfg = os.path.join(script_dir, 'yolo/cfg/yolov3-spp.cfg')
         self.model_weights = os.path.join(script_dir, 'yolo/data/yolov3-spp.weights')
+        # Memory-mappable copy of the weights written by dev_tools/build_alphapose_weights_cache.py
+        self.weights_cache = os.path.join(script_dir, 'yolo/data/yolov3-spp.cache.pt')
         self.inp_dim = cfg.get('INP_DIM', 608)
         self.nms_thres = cfg.get('NMS_THRES', 0.6)
         self.confidence = 0.3 if (False if not hasattr(opt, 'tracking') else opt.tracking) else cfg.get('CONFIDENCE', 0.05)
@@ -51,8 +55,15 @@ class YOLODetector(BaseDetector):
         args = self.detector_opt
 
         print('Loading YOLO model..')
+        start = time.perf_counter()
         self.model = Darknet(self.model_cfg)
-        self.model.load_weights(self.model_weights)
+        if is_cache_valid(self.weights_cache, self.model_weights):
+            state_dict = torch.load(self.weights_cache, map_location='cpu', mmap=True, weights_only=True)
+            self.model.load_state_dict(state_dict, assign=True)
+            source = self.weights_cache
+        else:
+            self.model.load_weights(self.model_weights)
+            source = self.model_weights
         self.model.net_info['height'] = self.inp_dim
         
 
@@ -64,6 +75,16 @@ class YOLODetector(BaseDetector):
         else:
             self.model.cuda()
         self.model.eval()
+        print('YOLO model loaded from {} in {:.2f}s'.format(source, time.perf_counter() - start))
+
+    def set_input_dim(self, inp_dim):
+        """
+        Changes the network input size between frames (must be a multiple of 32)
+        """
+        self.inp_dim = inp_dim
+        if self.model is not None:
+            model = self.model.module if isinstance(self.model, torch.nn.DataParallel) else self.model
+            model.net_info['height'] = inp_dim
 
     def image_preprocess(self, img_source):
         """
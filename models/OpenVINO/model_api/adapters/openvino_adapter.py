@@ -25,7 +25,6 @@ except ImportError:
 
 from .model_adapter import ModelAdapter, Metadata
 from .utils import Layout
-from ..pipelines import parse_devices
 
 
 def create_core():
@@ -69,22 +68,7 @@ class OpenvinoAdapter(ModelAdapter):
             self.async_queue = AsyncInferQueue(self.compiled_model, len(self.async_queue) + 1)
 
         log.info('The model {} is loaded to {}'.format("from buffer" if self.model_from_buffer else self.model_path, self.device))
-        self.log_runtime_settings()
-
-    def log_runtime_settings(self):
-        devices = set(parse_devices(self.device))
-        if 'AUTO' not in devices:
-            for device in devices:
-                try:
-                    nstreams = self.compiled_model.get_property(device + '_THROUGHPUT_STREAMS')
-                    log.info('\tDevice: {}'.format(device))
-                    log.info('\t\tNumber of streams: {}'.format(nstreams))
-                    if device == 'CPU':
-                        nthreads = self.compiled_model.get_property('CPU_THREADS_NUM')
-                        log.info('\t\tNumber of threads: {}'.format(nthreads if int(nthreads) else 'AUTO'))
-                except RuntimeError:
-                    pass
-        log.info('\tNumber of model infer requests: {}'.format(len(self.async_queue)))
+        # The applied device settings are printed by utils.openvino_settings.log_runtime_settings()
 
     def get_input_layers(self):
         inputs = {}
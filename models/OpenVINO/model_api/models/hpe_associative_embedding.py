@@ -21,7 +21,12 @@ from scipy.optimize import linear_sum_assignment
 
 from .image_model import ImageModel
 from .types import NumericalValue, StringValue
-from .utils import resize_image
+from .utils import resize_image, padded_input
+
+# Algorithms for grouping joints into people by their tags
+TAG_MATCHERS = ('hungarian', 'greedy')
+# Minimal margin (heatmap pixels) of the local refinement window
+REFINE_MIN_MARGIN = 4
 
 
 class HpeAssociativeEmbedding(ImageModel):
@@ -66,7 +71,10 @@ class HpeAssociativeEmbedding(ImageModel):
             pose_threshold=self.confidence_threshold,
             use_detection_val=True,
             ignore_too_much=False,
-            dist_reweight=True)
+            dist_reweight=True,
+            matcher=self.tag_matcher,
+            refine_window=self.refine_window)
+        self.input_buffers = {}
 
     @classmethod
     def parameters(cls):
@@ -78,11 +86,17 @@ class HpeAssociativeEmbedding(ImageModel):
             'delta': NumericalValue(default_value=0.0),
             'size_divisor': NumericalValue(default_value=32, value_type=int),
             'padding_mode': StringValue(default_value='right_bottom', choices=('center', 'right_bottom')),
+            'tag_matcher': StringValue(default_value='hungarian', choices=TAG_MATCHERS),
+            'refine_window': NumericalValue(default_value=0.0, min=0.0),
         })
         return parameters
 
     def preprocess(self, inputs):
-        img = resize_image(inputs, (self.w, self.h), keep_aspect_ratio=True)
+        h, w = inputs.shape[:2]
+        if min(self.h / h, self.w / w) == 1:
+            img = inputs   # already fits, e.g. resized by pad_and_resize()
+        else:
+            img = resize_image(inputs, (self.w, self.h), keep_aspect_ratio=True)
         h, w = img.shape[:2]
         if not (self.h - self.size_divisor < h <= self.h and self.w - self.size_divisor < w <= self.w):
             self.logger.warning("\tChosen model aspect ratio doesn't match image aspect ratio")
@@ -92,9 +106,8 @@ class HpeAssociativeEmbedding(ImageModel):
             pad = ((self.h - h + 1) // 2, (self.h - h) // 2, (self.w - w + 1) // 2, (self.w - w) // 2)
         else:
             pad = (0, self.h - h, 0, self.w - w)
-        img = np.pad(img, (pad[:2], pad[2:], (0, 0)), mode='constant', constant_values=0)
-        img = img.transpose((2, 0, 1))  # Change data layout from HWC to CHW
-        img = img[None]
+        # Pad and change data layout from HWC to NCHW, into a reused input tensor
+        img = padded_input(self.input_buffers, img, (self.w, self.h), offset=(pad[0], pad[2]))
         meta = {
             'original_size': inputs.shape[:2],
             'resize_img_scale': resize_img_scale
@@ -102,10 +115,17 @@ class HpeAssociativeEmbedding(ImageModel):
         return {self.image_blob_name: img}, meta
 
     def postprocess(self, outputs, meta):
+        poses, scores = self.decoder(*self.decoder_inputs(outputs))
+        return self.rescale_poses(poses, scores, meta)
+
+    # The arrays self.decoder is called with, so decoding can also run elsewhere (see utils/decode_pool.py)
+    def decoder_inputs(self, outputs):
         heatmaps = outputs[self.heatmaps_blob_name]
         nms_heatmaps = outputs[self.nms_heatmaps_blob_name]
         aembds = outputs[self.embeddings_blob_name]
-        poses, scores = self.decoder(heatmaps, aembds, nms_heatmaps=nms_heatmaps)
+        return heatmaps, aembds, nms_heatmaps
+
+    def rescale_poses(self, poses, scores, meta):
         # Rescale poses to the original image.
         if self.padding_mode == 'center':
             scale = meta['resize_img_scale'][self.index_of_max_dimension]
@@ -132,42 +152,11 @@ def find_layer_by_name(name, layers):
     return suitable_layers[0]
 
 
-class Pose:
-    def __init__(self, num_joints, tag_size=1):
-        self.num_joints = num_joints
-        self.tag_size = tag_size
-        # 2 is for x, y and 1 is for joint confidence
-        self.pose = np.zeros((num_joints, 2 + 1 + tag_size), dtype=np.float32)
-        self.pose_tag = np.zeros(tag_size, dtype=np.float32)
-        self.valid_points_num = 0
-        self.c = np.zeros(2, dtype=np.float32)
-
-    def add(self, idx, joint, tag):
-        self.pose[idx] = joint
-        self.c = self.c * self.valid_points_num + joint[:2]
-        self.pose_tag = (self.pose_tag * self.valid_points_num) + tag
-        self.valid_points_num += 1
-        self.c /= self.valid_points_num
-        self.pose_tag /= self.valid_points_num
-
-    @property
-    def tag(self):
-        if self.valid_points_num > 0:
-            return self.pose_tag
-        return None
-
-    @property
-    def center(self):
-        if self.valid_points_num > 0:
-            return self.c
-        return None
-
-
 class AssociativeEmbeddingDecoder:
     def __init__(self, num_joints, max_num_people, detection_threshold, use_detection_val,
                  ignore_too_much, tag_threshold, pose_threshold,
                  adjust=True, refine=True, delta=0.0, joints_order=None,
-                 dist_reweight=True):
+                 dist_reweight=True, matcher='hungarian', refine_window=0.0):
         self.num_joints = num_joints
         self.max_num_people = max_num_people
         self.detection_threshold = detection_threshold
@@ -186,17 +175,55 @@ class AssociativeEmbeddingDecoder:
         self.dist_reweight = dist_reweight
         self.delta = delta
 
+        if matcher not in TAG_MATCHERS:
+            raise ValueError('Unknown tag matcher "{}", expected one of {}'.format(matcher, TAG_MATCHERS))
+        self.matcher = matcher
+
+        # Refinement searches missing joints within refine_window times the pose extent
+        # around the found joints (0 searches the whole heatmap).
+        self.refine_window = refine_window
+        self._scratch = np.empty(0, dtype=np.float32)
+
     @staticmethod
     def _max_match(scores):
         r, c = linear_sum_assignment(scores)
         return np.stack((r, c), axis=1)
 
+    @staticmethod
+    def _greedy_match(scores, valid):
+        # Greedy matching in rounds: a (joint, pose) pair is taken when each is the other's cheapest
+        # valid option, which gives the same result as taking the globally cheapest pair first.
+        # Rows left unmatched are paired with a column out of range, i.e. start a new pose.
+        num_added, num_grouped = scores.shape
+        cost = np.where(valid, scores, np.inf)
+        all_rows = np.arange(num_added)
+        match = np.full(num_added, num_grouped)
+        while True:
+            best_col = cost.argmin(axis=1)
+            best_row = cost.argmin(axis=0)
+            rows = all_rows[np.isfinite(cost[all_rows, best_col]) & (best_row[best_col] == all_rows)]
+            if len(rows) == 0:
+                break
+            cols = best_col[rows]
+            match[rows] = cols
+            cost[rows] = np.inf
+            cost[:, cols] = np.inf
+        return np.stack((all_rows, match), axis=1)
+
     def _match_by_tag(self, inp):
         tag_k, loc_k, val_k = inp
         embd_size = tag_k.shape[2]
         all_joints = np.concatenate((loc_k, val_k[..., None], tag_k), -1)
 
-        poses = []
+        # Person state: joints, running tag/center sums and number of joints added.
+        # Every candidate can start a new person, which bounds the number of people.
+        max_poses = self.num_joints * tag_k.shape[1]
+        poses = np.zeros((max_poses, self.num_joints, 2 + 1 + embd_size), dtype=np.float32)
+        tag_sums = np.zeros((max_poses, embd_size), dtype=np.float32)
+        center_sums = np.zeros((max_poses, 2), dtype=np.float32)
+        counts = np.zeros(max_poses, dtype=np.float32)
+        num_poses = 0
+
         for idx in self.joint_order:
             tags = tag_k[idx]
             joints = all_joints[idx]
@@ -204,49 +231,60 @@ class AssociativeEmbeddingDecoder:
             tags = tags[mask]
             joints = joints[mask]
 
-            if len(poses) == 0:
-                for tag, joint in zip(tags, joints):
-                    pose = Pose(self.num_joints, embd_size)
-                    pose.add(idx, joint, tag)
-                    poses.append(pose)
-                continue
-
-            if joints.shape[0] == 0 or (self.ignore_too_much and len(poses) == self.max_num_people):
+            if joints.shape[0] == 0 or (num_poses > 0 and self.ignore_too_much and num_poses == self.max_num_people):
                 continue
 
-            poses_tags = np.stack([p.tag for p in poses], axis=0)
-            diff = tags[:, None] - poses_tags[None, :]
-            diff_normed = np.linalg.norm(diff, ord=2, axis=2)
-            diff_saved = np.copy(diff_normed)
-
-            if self.dist_reweight:
-                # Reweight cost matrix to prefer nearby points among all that are close enough in a tag space.
-                centers = np.stack([p.center for p in poses], axis=0)[None]
-                dists = np.linalg.norm(joints[:, :2][:, None, :] - centers, ord=2, axis=2)
-                close_tags_masks = diff_normed < self.tag_threshold
-                min_dists = np.min(dists, axis=0, keepdims=True)
-                dists /= min_dists + 1e-10
-                diff_normed[close_tags_masks] *= dists[close_tags_masks]
-
-            if self.use_detection_val:
-                diff_normed = np.round(diff_normed) * 100 - joints[:, 2:3]
-            num_added = diff.shape[0]
-            num_grouped = diff.shape[1]
-            if num_added > num_grouped:
-                diff_normed = np.pad(diff_normed, ((0, 0), (0, num_added - num_grouped)),
-                                     mode='constant', constant_values=1e10)
-
-            pairs = self._max_match(diff_normed)
-            for row, col in pairs:
-                if row < num_added and col < num_grouped and diff_saved[row][col] < self.tag_threshold:
-                    poses[col].add(idx, joints[row], tags[row])
+            if num_poses == 0:
+                new_rows = np.arange(len(joints))
+            else:
+                poses_tags = tag_sums[:num_poses] / counts[:num_poses, None]
+                diff = tags[:, None] - poses_tags[None, :]
+                diff_normed = np.linalg.norm(diff, ord=2, axis=2)
+                diff_saved = np.copy(diff_normed)
+
+                if self.dist_reweight:
+                    # Reweight cost matrix to prefer nearby points among all that are close enough in a tag space.
+                    centers = (center_sums[:num_poses] / counts[:num_poses, None])[None]
+                    dists = np.linalg.norm(joints[:, :2][:, None, :] - centers, ord=2, axis=2)
+                    close_tags_masks = diff_normed < self.tag_threshold
+                    min_dists = np.min(dists, axis=0, keepdims=True)
+                    dists /= min_dists + 1e-10
+                    diff_normed[close_tags_masks] *= dists[close_tags_masks]
+
+                if self.use_detection_val:
+                    diff_normed = np.round(diff_normed) * 100 - joints[:, 2:3]
+                num_added = diff.shape[0]
+                num_grouped = diff.shape[1]
+
+                if self.matcher == 'greedy':
+                    pairs = self._greedy_match(diff_normed, diff_saved < self.tag_threshold)
                 else:
-                    pose = Pose(self.num_joints, embd_size)
-                    pose.add(idx, joints[row], tags[row])
-                    poses.append(pose)
-
-        ans = np.asarray([p.pose for p in poses], dtype=np.float32).reshape(-1, self.num_joints, 2 + 1 + embd_size)
-        tags = np.asarray([p.tag for p in poses], dtype=np.float32).reshape(-1, embd_size)
+                    if num_added > num_grouped:
+                        diff_normed = np.pad(diff_normed, ((0, 0), (0, num_added - num_grouped)),
+                                             mode='constant', constant_values=1e10)
+                    pairs = self._max_match(diff_normed)
+
+                rows, cols = pairs[:, 0], pairs[:, 1]
+                matched = (rows < num_added) & (cols < num_grouped)
+                matched[matched] = diff_saved[rows[matched], cols[matched]] < self.tag_threshold
+
+                rows_m, cols_m = rows[matched], cols[matched]
+                poses[cols_m, idx] = joints[rows_m]
+                tag_sums[cols_m] += tags[rows_m]
+                center_sums[cols_m] += joints[rows_m, :2]
+                counts[cols_m] += 1
+                new_rows = rows[~matched]
+
+            # Unmatched joints start new people.
+            new_ids = np.arange(num_poses, num_poses + len(new_rows))
+            poses[new_ids, idx] = joints[new_rows]
+            tag_sums[new_ids] = tags[new_rows]
+            center_sums[new_ids] = joints[new_rows, :2]
+            counts[new_ids] = 1
+            num_poses += len(new_rows)
+
+        ans = poses[:num_poses]
+        tags = tag_sums[:num_poses] / counts[:num_poses, None]
         return ans, tags
 
     def top_k(self, heatmaps, tags):
@@ -322,6 +360,58 @@ class AssociativeEmbeddingDecoder:
 
         return keypoints
 
+    def refine_local(self, heatmap, tag, keypoints, pose_tag):
+        K, H, W = heatmap.shape
+        if len(tag.shape) == 3:
+            tag = tag[..., None]
+
+        found = keypoints[:, 2] > 0
+        missing = np.flatnonzero(~found)
+        if len(missing) == 0:
+            return keypoints
+        if not found.any():
+            return self.refine(heatmap, tag, keypoints, pose_tag)
+
+        # Search window: extent of the found joints plus a margin.
+        (x0, y0), (x1, y1) = keypoints[found, :2].min(axis=0), keypoints[found, :2].max(axis=0)
+        margin = self.refine_window * max(x1 - x0, y1 - y0) + REFINE_MIN_MARGIN
+        xs, ys = max(0, int(x0 - margin)), max(0, int(y0 - margin))
+        xe, ye = min(W, int(x1 + margin) + 1), min(H, int(y1 + margin) + 1)
+        h, w = ye - ys, xe - xs
+
+        # All missing joints at once, in reused scratch buffers.
+        n = len(missing) * h * w
+        if self._scratch.size < 2 * n:
+            self._scratch = np.empty(2 * n, dtype=np.float32)
+        diff = self._scratch[:n].reshape(len(missing), h, w)
+        window = self._scratch[n:2 * n].reshape(len(missing), h, w)
+        np.take(tag[:, ys:ye, xs:xe, 0], missing, axis=0, out=diff, mode='clip')
+        np.take(heatmap[:, ys:ye, xs:xe], missing, axis=0, out=window, mode='clip')
+
+        # Same cost as refine(): integer tag distance, ties broken by the heatmap value.
+        np.subtract(diff, np.asarray(pose_tag).reshape(-1)[0], out=diff)
+        np.abs(diff, out=diff)
+        diff += 0.5
+        np.floor(diff, out=diff)
+        diff -= window
+        y, x = np.divmod(diff.reshape(len(missing), -1).argmin(axis=1), w)
+        x += xs
+        y += ys
+
+        # Corresponding keypoint detection score.
+        val = heatmap[missing, y, x]
+        valid = val > 0
+        joints, x, y = missing[valid], x[valid], y[valid]
+        keypoints[joints, 0] = x
+        keypoints[joints, 1] = y
+        keypoints[joints, 2] = val[valid]
+
+        inner = (1 < x) & (x < W - 1) & (1 < y) & (y < H - 1)
+        joints, x, y = joints[inner], x[inner], y[inner]
+        keypoints[joints, 0] += np.sign(heatmap[joints, y, x + 1] - heatmap[joints, y, x - 1]) * .25
+        keypoints[joints, 1] += np.sign(heatmap[joints, y + 1, x] - heatmap[joints, y - 1, x]) * .25
+        return keypoints
+
     def __call__(self, heatmaps, tags, nms_heatmaps):
         tag_k, loc_k, val_k = self.top_k(nms_heatmaps, tags)
         ans = tuple(map(self._match_by_tag, zip(tag_k, loc_k, val_k)))  # Call _match_by_tag() for each element in batch
@@ -348,6 +438,9 @@ class AssociativeEmbeddingDecoder:
             heatmap_numpy = heatmaps[0]
             tag_numpy = tags[0]
             for i, pose in enumerate(ans):
-                ans[i] = self.refine(heatmap_numpy, tag_numpy, pose, ans_tags[0][i])
+                if self.refine_window > 0:
+                    ans[i] = self.refine_local(heatmap_numpy, tag_numpy, pose, ans_tags[0][i])
+                else:
+                    ans[i] = self.refine(heatmap_numpy, tag_numpy, pose, ans_tags[0][i])
 
         return ans, scores
@@ -24,6 +24,7 @@ import openvino.runtime.opset8 as opset8
 
 from .image_model import ImageModel
 from .types import NumericalValue
+from .utils import padded_input
 
 
 class OpenPose(ImageModel):
@@ -86,6 +87,7 @@ class OpenPose(ImageModel):
 
         num_joints = self.outputs[self.heatmaps_blob_name].shape[1] - 1  # The last channel is for background
         self.decoder = OpenPoseDecoder(num_joints, score_threshold=self.confidence_threshold)
+        self.input_buffers = {}
 
     @classmethod
     def parameters(cls):
@@ -106,6 +108,8 @@ class OpenPose(ImageModel):
     @staticmethod
     def _resize_image(frame, input_h):
         h = frame.shape[0]
+        if h == input_h:
+            return frame
         scale = input_h / h
         return cv2.resize(frame, None, fx=scale, fy=scale)
 
@@ -118,19 +122,24 @@ class OpenPose(ImageModel):
             self.logger.warning("\tChosen model aspect ratio doesn't match image aspect ratio")
         resize_img_scale = np.array((inputs.shape[1] / w, inputs.shape[0] / h), np.float32)
 
-        img = np.pad(img, ((0, 0), (0, self.w - w), (0, 0)),
-                     mode='constant', constant_values=0)
-        img = img.transpose((2, 0, 1))  # Change data layout from HWC to CHW
-        img = img[None]
+        # Pad and change data layout from HWC to NCHW, into a reused input tensor
+        img = padded_input(self.input_buffers, img, (self.w, self.h))
         meta = {'resize_img_scale': resize_img_scale}
         return {self.image_blob_name: img}, meta
 
     def postprocess(self, outputs, meta):
+        poses, scores = self.decoder(*self.decoder_inputs(outputs))
+        return self.rescale_poses(poses, scores, meta)
+
+    # The arrays self.decoder is called with, so decoding can also run elsewhere (see utils/decode_pool.py)
+    def decoder_inputs(self, outputs):
         heatmaps = outputs[self.heatmaps_blob_name]
         pafs = outputs[self.pafs_blob_name]
         pooled_heatmaps = outputs[self.pooled_heatmaps_blob_name]
         nms_heatmaps = self.heatmap_nms(heatmaps, pooled_heatmaps)
-        poses, scores = self.decoder(heatmaps, nms_heatmaps, pafs)
+        return heatmaps, nms_heatmaps, pafs
+
+    def rescale_poses(self, poses, scores, meta):
         # Rescale poses to the original image.
         poses[:, :, :2] *= meta['resize_img_scale'] * self.output_scale
         return poses, scores
@@ -184,55 +193,44 @@ class OpenPoseDecoder:
         assert batch_size == 1, 'Batch size of 1 only supported'
         assert channels_num >= self.num_joints
 
-        xs, ys, scores = self.top_k(nms_heatmaps)
-        masks = scores > self.score_threshold
-        all_keypoints = []
-        keypoint_id = 0
-        for k in range(self.num_joints):
-            # Filter low-score points.
-            mask = masks[0, k]
-            x = xs[0, k][mask].ravel()
-            y = ys[0, k][mask].ravel()
-            score = scores[0, k][mask].ravel()
-            n = len(x)
-            if n == 0:
-                all_keypoints.append(np.empty((0, 4), dtype=np.float32))
-                continue
-            # Apply quarter offset to improve localization accuracy.
-            x, y = self.refine(heatmaps[0, k], x, y)
-            clip(x, 0, w - 1, out=x)
-            clip(y, 0, h - 1, out=y)
-            # Pack resulting points.
-            keypoints = np.empty((n, 4), dtype=np.float32)
-            keypoints[:, 0] = x
-            keypoints[:, 1] = y
-            keypoints[:, 2] = score
-            keypoints[:, 3] = np.arange(keypoint_id, keypoint_id + n)
-            keypoint_id += n
-            all_keypoints.append(keypoints)
-        return all_keypoints
+        ks, xs, ys, scores = self.top_k(nms_heatmaps)
+        # Apply quarter offset to improve localization accuracy.
+        x, y = self.refine(heatmaps[0], ks, xs, ys)
+        clip(x, 0, w - 1, out=x)
+        clip(y, 0, h - 1, out=y)
+        # Pack resulting points, ids run over all joints in joint order.
+        n = len(x)
+        keypoints = np.empty((n, 4), dtype=np.float32)
+        keypoints[:, 0] = x
+        keypoints[:, 1] = y
+        keypoints[:, 2] = scores
+        keypoints[:, 3] = np.arange(n)
+        counts = np.bincount(ks, minlength=self.num_joints)
+        return np.split(keypoints, np.cumsum(counts)[:-1])
 
     def top_k(self, heatmaps):
-        N, K, _, W = heatmaps.shape
-        heatmaps = heatmaps.reshape(N, K, -1)
-        # Get positions with top scores.
-        ind = heatmaps.argpartition(-self.max_points, axis=2)[:, :, -self.max_points:]
-        scores = np.take_along_axis(heatmaps, ind, axis=2)
-        # Keep top scores sorted.
-        subind = np.argsort(-scores, axis=2)
-        ind = np.take_along_axis(ind, subind, axis=2)
-        scores = np.take_along_axis(scores, subind, axis=2)
-        y, x = np.divmod(ind, W)
-        return x, y, scores
+        # The NMS heatmaps are zero almost everywhere, so only the few peaks above
+        # the threshold are considered, for all joints at once.
+        ks, ys, xs = np.nonzero(heatmaps[0, :self.num_joints] > self.score_threshold)
+        scores = heatmaps[0, ks, ys, xs]
+        # Group by joint, top scores first.
+        order = np.lexsort((-scores, ks))
+        ks, ys, xs, scores = ks[order], ys[order], xs[order], scores[order]
+        # Keep at most max_points per joint.
+        counts = np.bincount(ks, minlength=self.num_joints)
+        rank = np.arange(len(ks)) - (np.cumsum(counts) - counts)[ks]
+        keep = rank < self.max_points
+        return ks[keep], xs[keep], ys[keep], scores[keep]
 
     @staticmethod
-    def refine(heatmap, x, y):
-        h, w = heatmap.shape[-2:]
+    def refine(heatmaps, k, x, y):
+        h, w = heatmaps.shape[-2:]
         valid = np.logical_and(np.logical_and(x > 0, x < w - 1), np.logical_and(y > 0, y < h - 1))
+        kk = k[valid]
         xx = x[valid]
         yy = y[valid]
-        dx = np.sign(heatmap[yy, xx + 1] - heatmap[yy, xx - 1], dtype=np.float32) * 0.25
-        dy = np.sign(heatmap[yy + 1, xx] - heatmap[yy - 1, xx], dtype=np.float32) * 0.25
+        dx = np.sign(heatmaps[kk, yy, xx + 1] - heatmaps[kk, yy, xx - 1], dtype=np.float32) * 0.25
+        dy = np.sign(heatmaps[kk, yy + 1, xx] - heatmaps[kk, yy - 1, xx], dtype=np.float32) * 0.25
         x = x.astype(np.float32)
         y = y.astype(np.float32)
         x[valid] += dx
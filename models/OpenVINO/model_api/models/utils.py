@@ -127,6 +127,28 @@ def pad_image(image, size):
     return image
 
 
+# Max number of input tensors kept by padded_input() per model
+MAX_INPUT_BUFFERS = 8
+
+
+def padded_input(buffers, image, size, offset=(0, 0)):
+    """
+    Copies a HWC image into a zero padded NCHW input tensor of the given (w, h) size, with its
+    top left corner at offset (y, x). Tensors are reused from `buffers` (a dict), keyed by the
+    image size and offset so the padding is never written and stays zero.
+    """
+    h, w = image.shape[:2]
+    key = (h, w, offset, image.dtype.str)
+    tensor = buffers.get(key)
+    if tensor is None:
+        if len(buffers) >= MAX_INPUT_BUFFERS:
+            buffers.clear()
+        tensor = buffers[key] = np.zeros((1, image.shape[2], size[1], size[0]), image.dtype)
+    y, x = offset
+    tensor[0].transpose(1, 2, 0)[y:y + h, x:x + w] = image
+    return tensor
+
+
 def resize_image_letterbox(image, size, interpolation=cv2.INTER_LINEAR):
     ih, iw = image.shape[0:2]
     w, h = size
@@ -66,7 +66,7 @@ def get_user_config(flags_d: str, flags_nstreams: str, flags_nthreads: int)-> Di
         if device == 'CPU':  # CPU supports a few special performance-oriented keys
             # limit threading for CPU portion of inference
             if flags_nthreads:
-                config['CPU_THREADS_NUM'] = str(flags_nthreads)
+                config['INFERENCE_NUM_THREADS'] = str(flags_nthreads)
 
             config['ENABLE_CPU_PINNING'] = 'NO'
             if "CPU_THROUGHPUT_STREAMS" in supported_properties:
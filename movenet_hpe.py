@@ -5,6 +5,8 @@ import numpy as np
 import cv2
 from pathlib import Path
 from base_hpe import BaseHPE, Body
+from utils.result_cache import file_fingerprint
+from utils.openvino_settings import OpenVINOSettings, log_runtime_settings
 
 SCRIPT_DIR = Path(__file__).resolve().parent
 DEFAULT_MODEL = SCRIPT_DIR / "models/MoveNet/movenet_multipose_lightning_256x256_FP32.xml"
@@ -17,17 +19,20 @@ class MoveNetHPE(BaseHPE):
         [12,14], [14,16], [11,13], [13,15]
     ]
 
-    def __init__(self, xml_path=DEFAULT_MODEL, device="CPU", **kwargs):
+    def __init__(self, xml_path=DEFAULT_MODEL, device="CPU", performance_hint=None, num_streams=None, num_threads=None, infer_requests=0, **kwargs):
         kwargs['pd_w'] = 256
         kwargs['pd_h'] = 256
         super().__init__(**kwargs)
         self.xml_path = xml_path
-        self.device = device
         self.model_type = "movenet"
 
-        if self.device == "GPU":
+        # MoveNet runs one synchronous request per frame, infer_requests does not apply
+        self.ov_settings = OpenVINOSettings(device, performance_hint, num_streams, num_threads, infer_requests)
+        if self.ov_settings.uses_gpu():
             print(f"[INFO] Model '{self.model_type}' is not supported on GPU. Falling back to CPU.")
-            self.device = "CPU"
+            self.ov_settings = self.ov_settings.without_gpu()
+        self.device = self.ov_settings.device
+        print(f"[INFO] OpenVINO settings: {self.ov_settings}")
 
     def load_model(self):
         print("Loading MoveNetHPE model...")
@@ -52,10 +57,24 @@ class MoveNetHPE(BaseHPE):
 
         self.pd_kps = "Identity"
         print("Loading pose detection model into the plugin")
-        self.pd_exec_net = self.ie.compile_model(model=self.pd_net, device_name=self.device)
+        self.pd_exec_net = self.ie.compile_model(model=self.pd_net, device_name=self.device, config=self.ov_settings.plugin_config())
+        log_runtime_settings(self.model_type, self.pd_exec_net, 1)
+
+    def cache_settings(self):
+        return {
+            "method": self.model_type,
+            "model": file_fingerprint(self.xml_path, Path(self.xml_path).with_suffix(".bin")),
+            "device": self.device,
+        }
+
+    # Only the keypoint output is used by postprocess()
+    def to_cache(self, predictions):
+        return {self.pd_kps: np.asarray(predictions[self.pd_kps])}
 
     def run_model(self, padded):
-        frame_nn = cv2.cvtColor(padded, cv2.COLOR_BGR2RGB).transpose(2,0,1).astype(np.float32)[None,] 
+        rgb = cv2.cvtColor(padded, cv2.COLOR_BGR2RGB, dst=self.buffers.get("rgb", padded.shape))
+        frame_nn = self.buffers.get("input", (1, 3) + padded.shape[:2], np.float32)
+        frame_nn[0] = rgb.transpose(2, 0, 1)
 
         return self.pd_exec_net.infer_new_request({self.pd_input_blob: frame_nn})
     
@@ -1,11 +1,15 @@
 from pathlib import Path
+import time
 from base_hpe import BaseHPE
 import numpy as np
 from base_hpe import Body
 
 from models.OpenVINO.model_api.models import ImageModel
 from models.OpenVINO.model_api.adapters import create_core, OpenvinoAdapter
-from models.OpenVINO.model_api.pipelines import get_user_config
+from utils.model_pool import CompiledModelPool
+from utils.decode_pool import DecodePool
+from utils.result_cache import file_fingerprint
+from utils.openvino_settings import OpenVINOSettings, log_runtime_settings
 
 
 SCRIPT_DIR = Path(__file__).resolve().parent
@@ -42,6 +46,15 @@ MODEL_CONFIGS = {
     }
 }
 
+# Aspect ratios (width / height) the models are compiled for
+ASPECT_BUCKETS = (9 / 16, 3 / 4, 1.0, 4 / 3, 16 / 9)
+
+# Attributes describing the frame being processed, saved with frames waiting in the decode pool
+FRAME_CONTEXT_ATTRS = ('img_w', 'img_h', 'padding', 'pd_w', 'pd_h', 'univ_time', 'current_image_file')
+
+def closest_aspect_bucket(aspect_ratio):
+    return min(ASPECT_BUCKETS, key=lambda bucket: abs(np.log(aspect_ratio / bucket)))
+
 class OpenVINOBaseHPE(BaseHPE):
     LINES_BODY = [
         [4,2], [2,0], [0,1], [1,3],
@@ -50,48 +63,190 @@ class OpenVINOBaseHPE(BaseHPE):
         [12,14], [14,16], [11,13], [13,15]
     ]
 
-    def __init__(self, model_type, device="CPU", **kwargs):
+    def __init__(self, model_type, device="CPU", model_pool_size=4, tag_matcher="hungarian", refine_window=0.0, decode_workers=0,
+                 performance_hint=None, num_streams=None, num_threads=None, infer_requests=0, **kwargs):
         if model_type not in MODEL_CONFIGS:
             raise ValueError(f"Unsupported model type: {self.model_type}. Choose from: {list(MODEL_CONFIGS.keys())}")
 
         self.model_type = model_type
         self.model_cfg = MODEL_CONFIGS[self.model_type]
-        self.device = device
+        self.ov_settings = OpenVINOSettings(device, performance_hint, num_streams, num_threads, infer_requests)
+        self.tag_matcher = tag_matcher
+        self.refine_window = refine_window
+
+        # Optional worker processes for the pose decoder, see process_frame()
+        self.decode_workers = decode_workers
+        self.decode_pool = None
 
-        if self.device == "GPU" and not self.model_cfg["gpu_supported"]:
+        if self.ov_settings.uses_gpu() and not self.model_cfg["gpu_supported"]:
             print(f"[INFO] Model '{self.model_type}' is not supported on GPU. Falling back to CPU.")
-            self.device = "CPU"
+            self.ov_settings = self.ov_settings.without_gpu()
+        self.device = self.ov_settings.device
+        print(f"[INFO] OpenVINO settings: {self.ov_settings}")
 
         self.pd_w, self.pd_h = self.model_cfg["input_size"]
 
+        # openpose sizes its input by height, the associative embedding models by the shorter side
+        self.default_target_size = self.pd_h if self.model_cfg["architecture"] == "openpose" else min(self.pd_w, self.pd_h)
+        self.target_size = self.default_target_size
+
+        # Compiled models keyed by (target size, aspect ratio bucket), see set_padding()
+        self.model_pool = CompiledModelPool(self.create_model, capacity=model_pool_size)
+        self.model_key = None
+
         super().__init__(**kwargs)
 
     def load_model(self):
         print(f"Loading {self.model_type} model...")
 
+        # Compile the shapes of the known input now, directories compile per bucket on first use
+        target_sizes = self.input_sizes() if self.target_latency_ms else [self.target_size]
+        self.model_pool.capacity = max(self.model_pool.capacity, len(target_sizes))
+        if self.img_w and self.img_h:
+            bucket = closest_aspect_bucket(self.img_w / self.img_h)
+            for target_size in target_sizes:
+                self.model_pool.get((target_size, bucket))
+
+        if self.decode_workers > 0:
+            self.decode_pool = DecodePool(num_workers=self.decode_workers, max_pending=2 * self.decode_workers)
+            print(f"[INFO] Decoding poses in {self.decode_workers} worker processes")
+        print("Loading completed")
+
+    def create_model(self, key):
+        target_size, aspect_ratio = key
         xml_path = self.model_cfg["path"]
 
-        plugin_config = get_user_config(self.device, '', None)
+        plugin_config = self.ov_settings.plugin_config()
         model_adapter = OpenvinoAdapter(create_core(), xml_path, device=self.device, plugin_config=plugin_config,
-                                        max_num_requests=0, model_parameters = {'input_layouts': 0})
-
-        # Default to 1.0 aspect ratio if dimensions aren't known at load time
-        aspect_ratio = (self.img_w / self.img_h) if (self.img_w and self.img_h) else 1.0
+                                        max_num_requests=self.ov_settings.infer_requests, model_parameters = {'input_layouts': 0})
 
         config = {
-            'target_size': None,
+            'target_size': target_size,
             'aspect_ratio': aspect_ratio,
             'confidence_threshold': self.score_thresh,
             'padding_mode': 'center' if self.model_type == 'higherhrnet' else None, # the 'higherhrnet' and 'ae' specific
             'delta': 0.5 if self.model_type == 'higherhrnet' else None, # the 'higherhrnet' and 'ae' specific
+            'tag_matcher': self.tag_matcher, # the 'higherhrnet' and 'ae' specific
+            'refine_window': self.refine_window, # the 'higherhrnet' and 'ae' specific
         }
         architecture = self.model_cfg["architecture"]
-        self.model = ImageModel.create_model(architecture, model_adapter, config)
-        self.model.log_layers_info()
-        self.model.load()
-        print("Loading completed")
+        model = ImageModel.create_model(architecture, model_adapter, config)
+        model.log_layers_info()
+        model.load()
+        log_runtime_settings(f"{self.model_type} {key}", model_adapter.compiled_model, len(model_adapter.async_queue))
+        return model
+
+    def input_sizes(self):
+        return [round(self.default_target_size * scale) for scale in self.resolution_scales]
+
+    def apply_input_size(self, size):
+        self.target_size = size
+        if self.img_w and self.img_h:
+            self.set_padding()
+
+    # Routes the image to the closest aspect ratio bucket: the padded input takes the
+    # bucket's ratio, so landscape and portrait images are not padded to a fixed shape
+    def set_padding(self):
+        bucket = closest_aspect_bucket(self.img_w / self.img_h)
+        self.model_key = (self.target_size, bucket)
+
+        if bucket >= 1.0 or self.model_cfg["architecture"] == "openpose":
+            self.pd_w, self.pd_h = round(self.target_size * bucket), self.target_size
+        else:
+            self.pd_w, self.pd_h = self.target_size, round(self.target_size / bucket)
+
+        super().set_padding()
+
+    # The cache holds the model outputs before decoding, see predict(). The decoder options and
+    # threshold (confidence_threshold is the score threshold) are applied on every hit, so they are not part of the key
+    def cache_settings(self):
+        xml_path = self.model_cfg["path"]
+        return {
+            "method": self.model_type,
+            "model": file_fingerprint(xml_path, xml_path.with_suffix(".bin")),
+            "device": self.device,
+            "model_key": self.model_key,
+        }
+
+    # Decoder inputs and preprocessing meta of the padded frame, from the model or the result cache
+    def model_outputs(self, frame, key):
+        cached = self.result_cache.get(key) if key else None
+        if cached is not None:
+            return cached
+
+        inputs, preprocessing_meta = self.model.preprocess(self.pad_and_resize(frame))
+        outputs = (self.model.decoder_inputs(self.model.infer_sync(inputs)), preprocessing_meta)
+        if key:
+            self.result_cache.put(key, outputs)
+        return outputs
+
+    # Like BaseHPE.predict(), with the decoder run on cached outputs too, so a rerun with another
+    # score threshold or tag matcher reuses the inference
+    def predict(self, frame):
+        self.model = self.model_pool.get(self.model_key)
+        decoder_inputs, preprocessing_meta = self.model_outputs(frame, self.cache_key(frame))
+        poses, _ = self.model.rescale_poses(*self.model.decoder(*decoder_inputs), preprocessing_meta)
+        return poses
+
+    def main_loop(self):
+        super().main_loop()
+        print(self.model_pool.summary())
+        if self.decode_pool:
+            self.decode_pool.close()
+
+    # With a decode pool, the decoder of frame t runs in a worker while frame t+1 is inferred.
+    # Frames are completed in order by complete_frame(). ROI crops are processed synchronously.
+    def infer_frame(self, frame, frame_number):
+        if self.decode_pool is None or self.select_region(frame_number) is not None:
+            self.flush_pending_frames()
+            return super().infer_frame(frame, frame_number)
+
+        timestamp = time.time()
+        self.model = self.model_pool.get(self.model_key)
+        decoder_inputs, preprocessing_meta = self.model_outputs(frame, self.cache_key(frame))
+
+        # The frame array may be reused by the next capture, keep a copy if it is rendered later.
+        # output_frame() renders into this copy without copying the frame again
+        if (self.save_image or self.save_video) and self.reader.reuses_memory(frame):
+            frame = frame.copy()
+        context = (frame, frame_number, timestamp, self.model, preprocessing_meta, self.frame_context())
+        for context, result in self.decode_pool.submit(self.model.decoder, decoder_inputs, context):
+            self.complete_frame(context, result)
+
+    def flush_pending_frames(self):
+        if self.decode_pool:
+            for context, result in self.decode_pool.drain():
+                self.complete_frame(context, result)
+
+    def complete_frame(self, context, result):
+        frame, frame_number, timestamp, model, preprocessing_meta, frame_context = context
+        poses, _ = model.rescale_poses(*result, preprocessing_meta)
+
+        # Postprocess and export with the state of the frame when it was inferred
+        current_context = self.frame_context()
+        self.set_frame_context(frame_context)
+        try:
+            self.output_frame(frame, frame_number, timestamp, self.postprocess(poses))
+        finally:
+            self.set_frame_context(current_context)
+            if self.img_w and self.img_h:
+                self.set_padding()   # picks up input size changes made while outputting
+
+    # Per-frame state used by postprocess() and the exports
+    def frame_context(self):
+        context = {name: getattr(self, name) for name in FRAME_CONTEXT_ATTRS}
+        if self.scheduler:
+            context['deadline'] = (self.scheduler.deadline, self.scheduler.start_time)
+        return context
+
+    def set_frame_context(self, context):
+        for name in FRAME_CONTEXT_ATTRS:
+            setattr(self, name, context[name])
+        if self.scheduler:
+            self.scheduler.deadline, self.scheduler.start_time = context['deadline']
 
     def run_model(self, padded):
+        self.model = self.model_pool.get(self.model_key)
         inputs, preprocessing_meta = self.model.preprocess(padded)
         raw_result = self.model.infer_sync(inputs)
 
@@ -0,0 +1,77 @@
+class AdaptiveResolutionController:
+    """
+    Picks one of a small set of precompiled model input sizes per frame to keep the
+    per-frame latency within a target.
+
+    The latency is smoothed with an exponential moving average. Over budget, the
+    controller steps down to the next smaller size. With enough headroom it steps up
+    again, unless every detected person already covers a large part of the frame
+    (a larger input would not help them). When all people are large it also steps
+    down, since a smaller input finds them just as well. After each switch it waits
+    `cooldown` frames so the average reflects the new size.
+    """
+
+    def __init__(self, sizes, target_latency_ms, start_index=None, ema_alpha=0.2, headroom=0.7,
+                 cooldown=10, large_person_frac=0.5):
+        if not sizes:
+            raise ValueError("At least one input size is required")
+
+        self.sizes = list(sizes)   # ordered from smallest to largest
+        self.target_latency_ms = target_latency_ms
+        self.ema_alpha = ema_alpha
+        self.headroom = headroom
+        self.cooldown = cooldown
+        self.large_person_frac = large_person_frac
+
+        self.index = len(self.sizes) - 1 if start_index is None else start_index
+        self.latency_ema = None
+        self.frames_since_switch = 0
+        self.switches = []   # (frame_number, old size, new size, latency ema, reason)
+
+    @property
+    def size(self):
+        return self.sizes[self.index]
+
+    def update(self, frame_number, latency_ms, person_heights):
+        """
+        Feeds the latency of the last frame and the heights of the detected people as a
+        fraction of the frame height. Returns the new size if the controller switched, else None.
+        """
+        if self.latency_ema is None:
+            self.latency_ema = latency_ms
+        else:
+            self.latency_ema += self.ema_alpha * (latency_ms - self.latency_ema)
+
+        self.frames_since_switch += 1
+        if self.frames_since_switch < self.cooldown:
+            return None
+
+        all_large = len(person_heights) > 0 and min(person_heights) >= self.large_person_frac
+
+        if self.index > 0 and self.latency_ema > self.target_latency_ms:
+            return self._switch(frame_number, self.index - 1, "over latency budget")
+        if self.index > 0 and all_large:
+            return self._switch(frame_number, self.index - 1, "all people are large")
+        if self.index < len(self.sizes) - 1 and not all_large:
+            # Latency grows roughly with the number of input pixels
+            expected = self.latency_ema * self._pixels(self.index + 1) / self._pixels(self.index)
+            if expected < self.target_latency_ms * self.headroom:
+                return self._switch(frame_number, self.index + 1, "latency headroom")
+
+        return None
+
+    def _pixels(self, index):
+        size = self.sizes[index]
+        return size[0] * size[1] if isinstance(size, (tuple, list)) else size * size
+
+    def _switch(self, frame_number, new_index, reason):
+        old_size = self.size
+        self.index = new_index
+        self.switches.append((frame_number, old_size, self.size, self.latency_ema, reason))
+        print(f"[INFO] Frame {frame_number}: input size {old_size} -> {self.size} "
+              f"({reason}, latency {self.latency_ema:.1f}ms, target {self.target_latency_ms:.1f}ms)")
+
+        # Start measuring the new size from scratch
+        self.latency_ema = None
+        self.frames_since_switch = 0
+        return self.size
@@ -0,0 +1,52 @@
+import json
+import os
+
+CHECKPOINT_FILE = "checkpoint.json"
+
+# The checkpoint of a directory or video run is written to the output directory whenever
+# a segment of results has been saved (see utils/segmented_output.py):
+#     {"input": ..., "model_type": ..., "prefix": ..., "last_frame": 999,
+#      "last_source": "img_0999.jpg", "complete": false}
+# A resumed run continues after last_frame with the same prefix, so its segments are
+# added to the same manifest.
+
+def checkpoint_path(output_dir):
+    return os.path.join(output_dir, CHECKPOINT_FILE)
+
+def save_checkpoint(output_dir, input_src, model_type, prefix, segment, complete=False):
+    state = {
+        "input": os.path.abspath(str(input_src)),
+        "model_type": model_type,
+        "prefix": prefix,
+        "last_frame": segment["last_frame"],
+        "last_source": segment["last_source"],
+        "complete": complete,
+    }
+    path = checkpoint_path(output_dir)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f, indent=1)
+    os.replace(tmp_path, path)
+
+def load_checkpoint(output_dir, input_src, model_type):
+    """Returns the saved state of an earlier run on the same input and model, or None if there is none."""
+    path = checkpoint_path(output_dir)
+    if not os.path.exists(path):
+        print(f"[INFO] No checkpoint found in {output_dir}, starting from the first frame")
+        return None
+
+    with open(path) as f:
+        state = json.load(f)
+    if state["input"] != os.path.abspath(str(input_src)) or state["model_type"] != model_type:
+        raise ValueError(f"Checkpoint {path} belongs to a {state['model_type']} run on {state['input']}, "
+                         f"not to {model_type} on {input_src}")
+    return state
+
+def resume_index(image_files, state):
+    """Position in the sorted image list after the last image of the checkpoint."""
+    names = [os.path.basename(f) for f in image_files]
+    if state["last_source"] in names:
+        return names.index(state["last_source"]) + 1
+    # Image no longer there: fall back to the frame index
+    print(f"[WARNING] {state['last_source']} not found, resuming at image {state['last_frame'] + 1}")
+    return state["last_frame"] + 1
@@ -0,0 +1,134 @@
+import os
+import queue
+import multiprocessing as mp
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Seconds between checks that the workers are still alive while waiting for a result
+WORKER_POLL_S = 1.0
+
+class DecodePool:
+    """
+    Runs pose decoders (OpenPoseDecoder, AssociativeEmbeddingDecoder) in worker processes,
+    so decoding of one frame overlaps with inference of the next and does not hold the GIL
+    of the inference process.
+
+    The output tensors of a frame are copied into one of `max_pending` shared memory slots;
+    only the slot name, the array layout and the (small) decoder object are pickled.
+    Results are returned in submission order together with the caller's `context`.
+    """
+
+    def __init__(self, num_workers=2, max_pending=4, ctx=None):
+        # Workers are spawned, the inference process already runs runtime threads that must not be forked
+        ctx = ctx or mp.get_context("spawn")
+        self.max_pending = max(1, max_pending)
+        self.owner_pid = os.getpid()
+
+        self.slots = [None] * self.max_pending   # SharedMemory per slot, grown on demand
+        self.free_slots = list(range(self.max_pending))
+        self.pending = {}     # seq -> (slot, context)
+        self.finished = {}    # seq -> result, waiting for earlier frames
+        self.next_seq = 0
+        self.next_result = 0
+
+        self.tasks = ctx.Queue()
+        self.results = ctx.Queue()
+        self.workers = [ctx.Process(target=_decode_worker, args=(self.tasks, self.results), daemon=True)
+                        for _ in range(max(1, num_workers))]
+        for w in self.workers:
+            w.start()
+
+    def submit(self, decoder, arrays, context):
+        """
+        Queues decoder(*arrays) and returns the (context, (poses, scores)) of all frames
+        completed in order so far. Blocks while max_pending frames are being decoded.
+        """
+        completed = self._collect(wait=lambda: not self.free_slots)
+
+        slot = self.free_slots.pop()
+        layout, nbytes = [], 0
+        for a in arrays:
+            layout.append((nbytes, a.shape, a.dtype.str))
+            nbytes += (a.nbytes + 63) // 64 * 64
+
+        shm = self.slots[slot]
+        if shm is None or shm.size < nbytes:
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+            shm = self.slots[slot] = shared_memory.SharedMemory(create=True, size=max(nbytes, 1))
+        for a, (offset, shape, dtype) in zip(arrays, layout):
+            np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)[...] = a
+
+        seq = self.next_seq
+        self.next_seq += 1
+        self.pending[seq] = (slot, context)
+        self.tasks.put((seq, slot, shm.name, layout, decoder))
+
+        return completed + self._collect()
+
+    def drain(self):
+        """Waits for all queued frames; returns their (context, result) in order."""
+        return self._collect(wait=lambda: bool(self.pending))
+
+    # Hands out the finished frames in order. Waits for results while wait() is true,
+    # then takes whatever else is already available.
+    def _collect(self, wait=lambda: False):
+        completed = []
+        while True:
+            while self.next_result in self.finished:
+                seq = self.next_result
+                self.next_result += 1
+                _, context = self.pending.pop(seq)
+                result = self.finished.pop(seq)
+                if isinstance(result, Exception):
+                    raise result
+                completed.append((context, result))
+
+            try:
+                seq, result = self.results.get(timeout=WORKER_POLL_S) if wait() else self.results.get_nowait()
+            except queue.Empty:
+                if not wait():
+                    return completed
+                # A worker killed by the OS (OOM, segfault) never returns its frame
+                dead = [w for w in self.workers if not w.is_alive()]
+                if dead:
+                    raise RuntimeError(f"Decode worker {dead[0].name} exited with code {dead[0].exitcode}")
+                continue
+            self.free_slots.append(self.pending[seq][0])
+            self.finished[seq] = result
+
+    def close(self):
+        for _ in self.workers:
+            self.tasks.put(None)
+        for w in self.workers:
+            w.join()
+        if os.getpid() == self.owner_pid:
+            for shm in self.slots:
+                if shm is not None:
+                    shm.close()
+                    shm.unlink()
+
+def _decode_worker(tasks, results):
+    attached = {}   # slot -> SharedMemory; a grown slot gets a new block, the old one is closed
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        seq, slot, shm_name, layout, decoder = task
+        try:
+            shm = attached.get(slot)
+            if shm is None or shm.name != shm_name:
+                if shm is not None:
+                    shm.close()
+                shm = attached[slot] = shared_memory.SharedMemory(name=shm_name)
+            arrays = [np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset) for offset, shape, dtype in layout]
+            results.put((seq, decoder(*arrays)))
+        except Exception as e:
+            results.put((seq, e))
+        finally:
+            arrays = None   # views on the block, which must be released before it can be closed
+
+    for shm in attached.values():
+        shm.close()
@@ -7,9 +7,10 @@ csv_rows = []
 bytes_per_mseconds_rows = []
 ultimate_ms = None
 json_buffer = ""
+dropped_frames = 0
 interval_msec = None
 
-def create_COCO_format(bodies, score_thresh, frame_number, univ_time = None):
+def create_COCO_format(bodies, score_thresh, frame_number, univ_time = None, reused = False):
     # Flags for COCO format
     CATEGORY_PERSON = 1
     NOT_LABELED = 0
@@ -34,27 +35,41 @@ def create_COCO_format(bodies, score_thresh, frame_number, univ_time = None):
         if univ_time is not None:
             result_enty["univ_time"] = float(univ_time) 
 
+        # Poses copied from the last inferred frame by the motion gate
+        if reused:
+            result_enty["reused"] = True
+
         results.append(result_enty)
 
     return results
 
-def append_COCO_format_json(bodies, score_thresh, frame_number, univ_time):
+def append_COCO_format_json(bodies, score_thresh, frame_number, univ_time, reused=False):
     global coco_results
 
-    coco_results.extend(create_COCO_format(bodies, score_thresh, frame_number, univ_time))
+    coco_results.extend(create_COCO_format(bodies, score_thresh, frame_number, univ_time, reused))
 
-def append_COCO_format_csv(bodies, score_thresh, frame_number, timestamp, measurement_interval_ms):
+# status: "ok", "late" if the frame missed its deadline (see utils/frame_scheduler.py),
+# or "reused" if the poses were copied from the last inferred frame (see utils/motion_gate.py)
+def append_COCO_format_csv(bodies, score_thresh, frame_number, timestamp, measurement_interval_ms, status="ok"):
     global csv_rows
 
     results = create_COCO_format(bodies, score_thresh, frame_number)
     json_string = json.dumps(results)
-    csv_rows.append([frame_number, timestamp, json_string])
+    csv_rows.append([frame_number, timestamp, json_string, status])
 
     append_Tx_csv_data(json_string, timestamp, measurement_interval_ms)    
 
+# Frames skipped by the frame scheduler: nothing is transmitted for them, but they are counted
+def append_dropped_frame_csv(frame_number, timestamp, measurement_interval_ms):
+    global csv_rows
+
+    csv_rows.append([frame_number, timestamp, "", "dropped"])
+
+    append_Tx_csv_data("", timestamp, measurement_interval_ms, dropped=1)
+
 # Measuring the transmitted data volume per time period
-def append_Tx_csv_data(json_string, timestamp, measurement_interval_ms):
-    global ultimate_ms, json_buffer, bytes_per_mseconds_rows, interval_msec
+def append_Tx_csv_data(json_string, timestamp, measurement_interval_ms, dropped=0):
+    global ultimate_ms, json_buffer, dropped_frames, bytes_per_mseconds_rows, interval_msec
 
     interval_msec = measurement_interval_ms / 1000.0
     current_ms = int(float(timestamp) // interval_msec)
@@ -62,32 +77,36 @@ def append_Tx_csv_data(json_string, timestamp, measurement_interval_ms):
     if ultimate_ms is None:
         ultimate_ms = current_ms
         json_buffer = json_string
+        dropped_frames = dropped
         return
     
     if current_ms == ultimate_ms:
         # Same second, accumulate
         json_buffer += json_string
+        dropped_frames += dropped
     else:
         # Time has advanced
         # Store previous msecond's total bytes
-        bytes_per_mseconds_rows.append([round(ultimate_ms * interval_msec, 3), len(json_buffer.encode('utf-8'))])
+        bytes_per_mseconds_rows.append([round(ultimate_ms * interval_msec, 3), len(json_buffer.encode('utf-8')), dropped_frames])
 
         # Fill missing mseconds with 0
         for missing_ms in range(ultimate_ms + 1, current_ms):
-            bytes_per_mseconds_rows.append([round(missing_ms * interval_msec, 3), 0])
+            bytes_per_mseconds_rows.append([round(missing_ms * interval_msec, 3), 0, 0])
 
         # Reset buffer for new msecond
         ultimate_ms = current_ms
         json_buffer = json_string
+        dropped_frames = dropped
 
 def reset_results():
-    global coco_results, csv_rows, bytes_per_mseconds_rows, ultimate_ms, json_buffer, interval_msec
+    global coco_results, csv_rows, bytes_per_mseconds_rows, ultimate_ms, json_buffer, dropped_frames, interval_msec
     coco_results = []
     csv_rows = []
     bytes_per_mseconds_rows = []
     ultimate_ms = None
     interval_msec = None
     json_buffer = ""
+    dropped_frames = 0
 
 def save_COCO_format_json(filepath):
     global coco_results
@@ -102,19 +121,19 @@ def save_COCO_format_csv(filepath):
     print(f"Saving file {filepath}")
     with open(filepath, 'w', newline='') as f:
         writer = csv.writer(f)
-        writer.writerow(["frame_number", "timestamp", "json_output"])  # header
+        writer.writerow(["frame_number", "timestamp", "json_output", "status"])  # header
         writer.writerows(csv_rows)  # write all data rows
 
 def save_Tx_csv_data(filepath):
-    global bytes_per_mseconds_rows, ultimate_ms, json_buffer, interval_msec
+    global bytes_per_mseconds_rows, ultimate_ms, json_buffer, dropped_frames, interval_msec
 
     # Flush last mseconds if data exists
-    if ultimate_ms is not None and json_buffer:
-        bytes_per_mseconds_rows.append([round(ultimate_ms * interval_msec, 3), len(json_buffer.encode('utf-8'))])
+    if ultimate_ms is not None and (json_buffer or dropped_frames):
+        bytes_per_mseconds_rows.append([round(ultimate_ms * interval_msec, 3), len(json_buffer.encode('utf-8')), dropped_frames])
 
 
     print(f"Saving file {filepath}")
     with open(filepath, 'w', newline='') as f:
         writer = csv.writer(f)
-        writer.writerow(["msecond", "json_bytes"])
+        writer.writerow(["msecond", "json_bytes", "dropped_frames"])
         writer.writerows(bytes_per_mseconds_rows)
\ No newline at end of file
@@ -0,0 +1,33 @@
+from collections import OrderedDict
+
+import numpy as np
+
+class FrameBuffers:
+    """
+    Preallocated arrays reused from frame to frame, so preprocessing writes into existing
+    memory (dst= arguments, slice assignment) instead of allocating new arrays per frame.
+
+    Buffers are keyed by (key, shape, dtype) and zero-initialised. Callers that only write
+    part of a buffer (e.g. an image into a zero padded canvas) include everything that
+    determines the written region in the key, so the rest stays zero. At most `capacity`
+    buffers are kept; the least recently used one is released when a new shape shows up,
+    which bounds memory on directories of differently sized images.
+    """
+
+    def __init__(self, capacity=16):
+        self.capacity = capacity
+        self.buffers = OrderedDict()
+        self.allocations = 0
+
+    def get(self, key, shape, dtype=np.uint8):
+        full_key = (key, tuple(shape), np.dtype(dtype).str)
+        buffer = self.buffers.get(full_key)
+        if buffer is not None:
+            self.buffers.move_to_end(full_key)
+            return buffer
+
+        if len(self.buffers) >= self.capacity:
+            self.buffers.popitem(last=False)
+        buffer = self.buffers[full_key] = np.zeros(shape, dtype)
+        self.allocations += 1
+        return buffer
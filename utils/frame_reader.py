@@ -0,0 +1,140 @@
+import glob
+import os
+import time
+
+import cv2
+import numpy as np
+
+from utils.checkpoint import resume_index
+
+class FrameReader:
+    """
+    Opens an input (image, directory of images, video file, webcam index or http stream)
+    and reads its frames. Used by BaseHPE and by the fan-out process of --methods.
+
+    frames() yields (frame, frame_number, univ_time, source file). grab_start/grab_end are
+    the wall times around the read of the current frame, the capture time of live input.
+    skip(frame_number, grab_start, grab_end) is called after every grab of a video, webcam
+    or stream; frames it returns True for are not decoded. Video frames are decoded into
+    the array of the previous frame (capture_buffer) when the size is unchanged, so a frame
+    is only valid until the next one is read.
+    """
+
+    def __init__(self, input_src):
+        self.img = None
+        self.img_dir = None
+        self.cap = None
+        self.capture_buffer = None
+        self.img_w = 0
+        self.img_h = 0
+        self.video_fps = 25
+        self.grab_start = None
+        self.grab_end = None
+
+        if os.path.isdir(input_src):
+            self.input_type = "directory"
+            self.img_dir = input_src
+        elif input_src:
+            if input_src.endswith('.jpg') or input_src.endswith('.png'):
+                self.input_type = "image"
+                self.img = cv2.imread(input_src)
+                self.img_h, self.img_w = self.img.shape[:2]
+            elif input_src.startswith("http"):
+                self.input_type = "ip_stream"
+
+                print(f"Attempting to connect to IP stream at {input_src}...")
+
+                # e.g. 60 tries * 1s = 60 seconds timeout
+                max_retries = 60
+                for attempt in range(max_retries):
+                    self.cap = cv2.VideoCapture(input_src)
+                    if self.cap.isOpened():
+                        break
+                    print(f"[{attempt+1}/{max_retries}] Stream not available, retrying in 1s...")
+                    time.sleep(1)
+
+                if not self.cap.isOpened():
+                    raise ValueError(f"Failed to connect to video stream after {max_retries} attempts: {input_src}")
+
+                # Give OpenCV a small buffer time to fetch metadata
+                time.sleep(0.5)
+
+                self.video_fps = int(self.cap.get(cv2.CAP_PROP_FPS)) or 25
+                self.img_w = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+                self.img_h = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            else:
+                if not input_src.isdigit():
+                    self.input_type = "video"
+                else:
+                    input_src = int(input_src)
+                    self.input_type = "webcam"
+                self.cap = cv2.VideoCapture(input_src)
+                self.cap.set(cv2.CAP_PROP_AUTOFOCUS, 0)
+                self.cap.set(cv2.CAP_PROP_FOCUS, 0)
+                self.video_fps = int(self.cap.get(cv2.CAP_PROP_FPS))
+                self.img_w = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+                self.img_h = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        else:
+            raise ValueError("No valid input source provided")
+
+        self.input_src = input_src
+
+    # True if the next frame is decoded into the memory of frame, which then has to be copied to be kept
+    def reuses_memory(self, frame):
+        return self.capture_buffer is not None and np.shares_memory(frame, self.capture_buffer)
+
+    # Directory and video input continue after the last frame of resume_state (see utils/checkpoint.py)
+    def frames(self, resume_state=None, skip=None):
+        frame_number = resume_state["last_frame"] + 1 if resume_state else 0
+
+        if self.input_type == "image":
+            self.grab_start = self.grab_end = time.time()
+            yield self.img, frame_number, 0, os.path.basename(self.input_src)
+
+        elif self.input_type == "directory":
+            # Get all image files from the directory
+            image_files = glob.glob(os.path.join(self.img_dir, '*.[pjg][np][ge]*'))
+            print(f"Found {len(image_files)} images in {self.img_dir}")
+
+            # Sort files to ensure they are in alphanumeric order
+            image_files = sorted(image_files)
+
+            total_frames = len(image_files)
+            if resume_state:
+                image_files = image_files[resume_index(image_files, resume_state):]
+            for image_file in image_files:
+                print(f"Processing {frame_number+1}/{total_frames}")
+                self.grab_start = time.time()
+                img = cv2.imread(image_file)
+                self.grab_end = time.time()
+                if img is None:
+                    print(f"Failed to load image: {image_file}")
+                    continue
+
+                yield img, frame_number, 0, os.path.basename(image_file)
+                frame_number += 1
+
+        else:   # webcam, video or stream
+            print("Starting processing video/webcam data. Press CTR+C to exit")
+            if resume_state:
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
+            while True:
+                self.grab_start = time.time()
+                if not self.cap.grab():
+                    break
+                self.grab_end = time.time()
+
+                univ_time = self.cap.get(cv2.CAP_PROP_POS_MSEC)  # timestamp of current frame, in milliseconds
+
+                # Skipped frames are not even decoded
+                if skip and skip(frame_number, self.grab_start, self.grab_end):
+                    frame_number += 1
+                    continue
+
+                ok, frame = self.cap.retrieve(self.capture_buffer)
+                if not ok:
+                    break
+                self.capture_buffer = frame
+
+                yield frame, frame_number, univ_time, ""
+                frame_number += 1
@@ -0,0 +1,94 @@
+import math
+
+# Policies for frames that cannot be processed in time
+DROP_POLICIES = ("drop-oldest", "every-nth", "adaptive")
+
+class FrameScheduler:
+    """
+    Gives every frame of a live input a deadline (capture time + latency budget) and
+    decides whether it is worth running inference on it.
+
+    Capture times are estimated on the nominal frame timeline (frame_number / fps),
+    re-anchored whenever a grab had to wait for the camera, since that frame was just
+    captured. Policies:
+        drop-oldest: frames past their deadline, or expected to miss it while a newer frame
+                     is already waiting, are dropped, so stale buffered frames are skipped
+                     until the input is caught up
+        every-nth:   only every Nth frame is processed
+        adaptive:    drop-oldest, plus a stride that follows the measured processing time
+                     so frames are only taken at the rate they can be processed
+    """
+
+    def __init__(self, budget_ms, fps, policy="drop-oldest", every_n=2, ema_alpha=0.2):
+        if policy not in DROP_POLICIES:
+            raise ValueError(f"Unsupported drop policy: {policy}. Choose from: {list(DROP_POLICIES)}")
+
+        self.budget = budget_ms / 1000
+        self.frame_interval = 1 / (fps or 25)
+        self.policy = policy
+        self.every_n = max(1, every_n)
+        self.ema_alpha = ema_alpha
+
+        self.t0 = None                 # wall time of frame 0 on the nominal timeline
+        self.deadline = None           # deadline of the frame being processed
+        self.start_time = None
+        self.processing_ema = None     # seconds per processed frame
+        self.last_processed = None
+
+        self.processed = 0
+        self.late = 0
+        self.dropped = 0
+
+    def capture_time(self, frame_number, grab_start, grab_end):
+        expected = None if self.t0 is None else self.t0 + frame_number * self.frame_interval
+        if expected is None or expected > grab_end or grab_end - grab_start > self.frame_interval / 2:
+            self.t0 = grab_end - frame_number * self.frame_interval
+            return grab_end
+        return expected
+
+    def stride(self):
+        if self.policy == "every-nth":
+            return self.every_n
+        if self.policy == "adaptive" and self.processing_ema is not None:
+            return max(1, math.ceil(self.processing_ema / self.frame_interval))
+        return 1
+
+    def should_process(self, frame_number, grab_start, grab_end):
+        """Called after each grab; returns False if the frame should be dropped."""
+        capture = self.capture_time(frame_number, grab_start, grab_end)
+        deadline = capture + self.budget
+
+        skip = self.last_processed is not None and frame_number - self.last_processed < self.stride()
+        too_late = False
+        if self.policy != "every-nth":
+            # Also drop a frame that would finish late when a newer one is already waiting
+            newer_waiting = grab_end - capture >= self.frame_interval
+            expected_end = grab_end + (self.processing_ema or 0)
+            too_late = grab_end > deadline or (newer_waiting and expected_end > deadline)
+        if skip or too_late:
+            self.dropped += 1
+            return False
+
+        self.deadline = deadline
+        self.start_time = grab_end
+        self.last_processed = frame_number
+        return True
+
+    def finish_frame(self, now):
+        """Called when a processed frame is done; returns its status for the exports ("ok" or "late")."""
+        elapsed = now - self.start_time
+        if self.processing_ema is None:
+            self.processing_ema = elapsed
+        else:
+            self.processing_ema += self.ema_alpha * (elapsed - self.processing_ema)
+
+        self.processed += 1
+        if now > self.deadline:
+            self.late += 1
+            return "late"
+        return "ok"
+
+    def summary(self):
+        total = self.processed + self.dropped
+        return (f"Frame scheduler ({self.policy}, budget {self.budget * 1000:.0f}ms): {self.processed}/{total} frames processed, "
+                f"{self.late} late, {self.dropped} dropped")
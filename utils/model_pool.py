@@ -0,0 +1,56 @@
+import time
+from collections import OrderedDict
+
+class CompiledModelPool:
+    """
+    Keeps up to `capacity` compiled models keyed by their input shape.
+    Models are compiled on first use by `factory(key)`; when the pool is full
+    the least recently used model is evicted.
+    """
+
+    def __init__(self, factory, capacity=4):
+        if capacity < 1:
+            raise ValueError("The model pool needs room for at least one model")
+
+        self.factory = factory
+        self.capacity = capacity
+        self.models = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.compile_time = 0.0
+
+    def get(self, key):
+        model = self.models.get(key)
+        if model is not None:
+            self.hits += 1
+            self.models.move_to_end(key)
+            return model
+
+        self.misses += 1
+        if len(self.models) >= self.capacity:
+            old_key, _ = self.models.popitem(last=False)
+            self.evictions += 1
+            print(f"[INFO] Model pool: evicted {old_key}")
+
+        start = time.perf_counter()
+        model = self.factory(key)
+        elapsed = time.perf_counter() - start
+        self.compile_time += elapsed
+        print(f"[INFO] Model pool: compiled {key} in {elapsed:.2f}s")
+
+        self.models[key] = model
+        return model
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "compile_time_s": self.compile_time,
+        }
+
+    def summary(self):
+        return (f"Model pool: {self.hits} hits, {self.misses} misses, {self.evictions} evictions, "
+                f"{self.compile_time:.2f}s spent compiling")
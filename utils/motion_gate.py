@@ -0,0 +1,52 @@
+import cv2
+import numpy as np
+
+class MotionGate:
+    """
+    Detects frames of a static scene, whose poses can be reused instead of running inference.
+
+    Frames are reduced to a small grayscale thumbnail (INTER_AREA, so every cell is the mean
+    of a block of pixels). A frame is static when no cell differs from the thumbnail of the
+    last inferred frame by more than `threshold` gray levels; comparing against the last
+    inferred frame (not the previous frame) keeps slow changes from accumulating unnoticed.
+    Inference is forced at least every `max_interval` frames.
+    """
+
+    def __init__(self, threshold=8.0, max_interval=30, thumbnail_width=64):
+        self.threshold = threshold
+        self.max_interval = max(1, max_interval)
+        self.thumbnail_width = thumbnail_width
+
+        self.reference = None      # thumbnail of the last inferred frame
+        self.last_inferred = None
+
+        self.frames = 0
+        self.reused = 0
+
+    def thumbnail(self, frame):
+        h, w = frame.shape[:2]
+        size = (self.thumbnail_width, max(1, round(self.thumbnail_width * h / w)))
+        small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return small.astype(np.int16)
+
+    def is_static(self, frame, frame_number):
+        """Returns True if the frame can reuse the last poses, otherwise it becomes the new reference."""
+        self.frames += 1
+        thumbnail = self.thumbnail(frame)
+
+        if (self.reference is not None and self.reference.shape == thumbnail.shape
+                and frame_number - self.last_inferred < self.max_interval
+                and np.abs(thumbnail - self.reference).max() <= self.threshold):
+            self.reused += 1
+            return True
+
+        self.reference = thumbnail
+        self.last_inferred = frame_number
+        return False
+
+    def summary(self):
+        share = 100 * self.reused / self.frames if self.frames else 0.0
+        return (f"Motion gate (threshold {self.threshold}, max interval {self.max_interval}): "
+                f"{self.reused}/{self.frames} frames reused previous poses ({share:.1f}%)")
@@ -0,0 +1,87 @@
+PERFORMANCE_HINTS = ("LATENCY", "THROUGHPUT", "CUMULATIVE_THROUGHPUT")
+DEVICE_TYPES = ("CPU", "GPU", "NPU", "AUTO", "MULTI", "HETERO")
+
+# Properties reported by log_runtime_settings()
+RUNTIME_PROPERTIES = ("PERFORMANCE_HINT", "NUM_STREAMS", "INFERENCE_NUM_THREADS", "OPTIMAL_NUMBER_OF_INFER_REQUESTS", "EXECUTION_DEVICES")
+
+class OpenVINOSettings:
+    """
+    Device and performance settings applied to every OpenVINO model of a run (OpenPose,
+    HigherHRNet/EfficientHRNet, MoveNet and the OpenVINO backend of AlphaPose).
+
+    device:          CPU, GPU, GPU.1, NPU, AUTO, AUTO:GPU,CPU, MULTI:GPU,CPU or HETERO:GPU,CPU
+    hint:            PERFORMANCE_HINT, one of PERFORMANCE_HINTS (None = plugin default)
+    streams:         NUM_STREAMS (None = from the hint, or the get_user_config() default)
+    threads:         INFERENCE_NUM_THREADS of the CPU (None = all cores)
+    infer_requests:  number of infer requests of the model_api models (0 = optimal number + 1)
+    """
+
+    def __init__(self, device="CPU", hint=None, streams=None, threads=None, infer_requests=0):
+        device = device.upper()
+        if device.split(":")[0].split(".")[0] not in DEVICE_TYPES:
+            raise ValueError(f"Unsupported OpenVINO device: {device}. Choose from: {list(DEVICE_TYPES)}, e.g. AUTO:GPU,CPU")
+        if hint is not None and hint.upper() not in PERFORMANCE_HINTS:
+            raise ValueError(f"Unsupported performance hint: {hint}. Choose from: {list(PERFORMANCE_HINTS)}")
+
+        self.device = device
+        self.hint = hint.upper() if hint else None
+        self.streams = streams
+        self.threads = threads
+        self.infer_requests = infer_requests
+
+    def uses_gpu(self):
+        return "GPU" in self.device
+
+    def without_gpu(self):
+        """The same settings on the CPU, for models that do not run on the GPU."""
+        return OpenVINOSettings("CPU", self.hint, self.streams, self.threads, self.infer_requests)
+
+    def plugin_config(self):
+        """
+        Config for compile_model(). Single devices get the get_user_config() defaults with these
+        settings applied; AUTO/MULTI/HETERO get streams and threads per hardware device.
+        """
+        from models.OpenVINO.model_api.pipelines import get_user_config
+
+        name, _, listed = self.device.partition(":")
+        if name in ("AUTO", "MULTI", "HETERO"):
+            config = {}
+            device_properties = {}
+            for device in (listed.split(",") if listed else ["CPU"]):
+                properties = {}
+                if self.streams is not None:
+                    properties["NUM_STREAMS"] = str(self.streams)
+                if self.threads is not None and device.startswith("CPU"):
+                    properties["INFERENCE_NUM_THREADS"] = str(self.threads)
+                if properties:
+                    device_properties[device] = properties
+            if device_properties:
+                config["DEVICE_PROPERTIES"] = device_properties
+        else:
+            config = get_user_config(self.device, str(self.streams) if self.streams is not None else '', self.threads)
+            stream_keys = [k for k in config if k == "NUM_STREAMS" or k.endswith("_THROUGHPUT_STREAMS")]
+            if self.hint and self.streams is None:
+                # Let the hint choose the number of streams instead of the default
+                for key in stream_keys:
+                    del config[key]
+            elif self.streams is not None and not stream_keys:
+                # get_user_config() only sets streams for the devices named CPU and GPU, not GPU.1 or NPU
+                config["NUM_STREAMS"] = str(self.streams)
+
+        if self.hint:
+            config["PERFORMANCE_HINT"] = self.hint
+        return config
+
+    def __str__(self):
+        return (f"device={self.device}, hint={self.hint or 'default'}, streams={self.streams or 'default'}, "
+                f"threads={self.threads or 'default'}, infer requests={self.infer_requests or 'auto'}")
+
+def log_runtime_settings(name, compiled_model, num_requests):
+    """Prints the settings OpenVINO actually applied to a compiled model."""
+    values = []
+    for prop in RUNTIME_PROPERTIES:
+        try:
+            values.append(f"{prop}={compiled_model.get_property(prop)}")
+        except RuntimeError:
+            pass   # not supported by this device
+    print(f"[INFO] OpenVINO {name}: {', '.join(values)}, infer requests={num_requests}")
@@ -0,0 +1,163 @@
+import queue
+import threading
+import time
+
+import cv2
+
+# Policies when the output queue is full
+FULL_POLICIES = ("block", "drop")
+
+class AsyncOutputSink:
+    """
+    Moves video writing and JPEG encoding off the inference thread.
+
+    Video frames go through a single writer thread so they stay in order.
+    Images are encoded by a pool of worker threads (cv2 releases the GIL while encoding).
+    Both queues are bounded; when one is full the frame is either waited for ("block")
+    or discarded and counted ("drop"). Frames that cannot be encoded or written are
+    counted as failed and the workers carry on, so a full disk cannot stall inference;
+    close() raises the first error.
+    """
+
+    def __init__(self, video_writer=None, queue_size=64, full_policy="block", num_workers=2, jpeg_quality=95):
+        if full_policy not in FULL_POLICIES:
+            raise ValueError(f"Unsupported full queue policy: {full_policy}. Choose from: {list(FULL_POLICIES)}")
+
+        self.video_writer = video_writer
+        self.full_policy = full_policy
+        self.encode_params = [cv2.IMWRITE_JPEG_QUALITY, int(jpeg_quality)]
+
+        self.lock = threading.Lock()
+        self.submitted = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.first_error = None
+        self.bytes_written = 0
+        self.encode_time = 0.0
+        self.first_submit_time = None
+
+        self.workers = []
+        self.video_queue = None
+        self.image_queue = None
+
+        if self.video_writer is not None:
+            self.video_queue = queue.Queue(maxsize=queue_size)
+            self.workers.append(self._start_worker(self._video_worker))
+
+        self.image_queue = queue.Queue(maxsize=queue_size)
+        for _ in range(max(1, num_workers)):
+            self.workers.append(self._start_worker(self._image_worker))
+
+    def _start_worker(self, target):
+        t = threading.Thread(target=target, daemon=True)
+        t.start()
+        return t
+
+    def _put(self, q, item):
+        with self.lock:
+            self.submitted += 1
+            if self.first_submit_time is None:
+                self.first_submit_time = time.perf_counter()
+
+        if self.full_policy == "block":
+            q.put(item)
+            return True
+
+        try:
+            q.put_nowait(item)
+            return True
+        except queue.Full:
+            with self.lock:
+                self.dropped += 1
+            return False
+
+    # The frame must not be modified by the caller after submission
+    def submit_video_frame(self, frame):
+        if self.video_queue is None:
+            raise ValueError("No video writer configured for the output sink")
+        return self._put(self.video_queue, frame)
+
+    def submit_image(self, filename, frame):
+        return self._put(self.image_queue, (filename, frame))
+
+    def _video_worker(self):
+        while True:
+            frame = self.video_queue.get()
+            if frame is None:
+                break
+            start = time.perf_counter()
+            try:
+                self.video_writer.write(frame)
+            except Exception as e:
+                self._record_failure(e)
+                continue
+            self._record(time.perf_counter() - start, 0)
+
+    def _image_worker(self):
+        while True:
+            item = self.image_queue.get()
+            if item is None:
+                # Pass the stop signal on to the other image workers
+                self.image_queue.put(None)
+                break
+            filename, frame = item
+            start = time.perf_counter()
+            try:
+                ok, buffer = cv2.imencode('.jpg', frame, self.encode_params)
+                if not ok:
+                    raise ValueError(f"Failed to encode image: {filename}")
+                with open(filename, 'wb') as f:
+                    f.write(buffer)
+            except Exception as e:
+                self._record_failure(e)
+                continue
+            self._record(time.perf_counter() - start, buffer.nbytes)
+
+    def _record(self, elapsed, nbytes):
+        with self.lock:
+            self.written += 1
+            self.encode_time += elapsed
+            self.bytes_written += nbytes
+
+    def _record_failure(self, error):
+        with self.lock:
+            self.failed += 1
+            if self.first_error is None:
+                self.first_error = error
+                print(f"[ERROR] Output sink: {error}")
+
+    def stats(self):
+        with self.lock:
+            wall = (time.perf_counter() - self.first_submit_time) if self.first_submit_time else 0.0
+            return {
+                "submitted": self.submitted,
+                "written": self.written,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                "bytes_written": self.bytes_written,
+                "encode_time_s": self.encode_time,
+                "wall_time_s": wall,
+                "frames_per_s": self.written / wall if wall > 0 else 0.0,
+                "mean_encode_ms": 1000 * self.encode_time / self.written if self.written else 0.0,
+            }
+
+    # Waits for all queued frames to be written and releases the video writer.
+    # Raises the first write error, if any frame failed
+    def close(self):
+        if self.video_queue is not None:
+            self.video_queue.put(None)
+        self.image_queue.put(None)
+        for t in self.workers:
+            t.join()
+
+        if self.video_writer is not None:
+            self.video_writer.release()
+
+        s = self.stats()
+        print(f"Output sink: {s['written']}/{s['submitted']} frames written, {s['dropped']} dropped, {s['failed']} failed, "
+              f"{s['frames_per_s']:.1f} frames/s, {s['mean_encode_ms']:.2f} ms/frame encode, "
+              f"{s['bytes_written'] / 1e6:.1f} MB of images")
+
+        if self.first_error is not None:
+            raise RuntimeError(f"Output sink: {self.failed} frames could not be written") from self.first_error
@@ -0,0 +1,100 @@
+import os
+
+# Thread pools of the BLAS/OpenMP libraries loaded by numpy, torch and OpenCV. They read
+# these variables once, when the library is loaded, so they are set before the first
+# import of numpy (see main.py).
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS", "NUMEXPR_NUM_THREADS", "VECLIB_MAXIMUM_THREADS")
+
+def parse_cpu_list(text):
+    """Parses a core list like "0-3,8,10-11" into a sorted list of core ids."""
+    cores = set()
+    for part in text.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        first, _, last = part.partition("-")
+        if not first.isdigit() or (last and not last.isdigit()):
+            raise ValueError(f"Invalid core list: {text}, expected e.g. 0-3,8")
+        cores.update(range(int(first), int(last or first) + 1))
+    if not cores:
+        raise ValueError(f"Invalid core list: {text}, expected e.g. 0-3,8")
+    return sorted(cores)
+
+def available_cores():
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+def share_of_cores(share, cores):
+    """
+    Cores of share "K/N": the K-th (1-based) of N equal slices of the available cores, so N
+    processes started with 1/N .. N/N get disjoint cores. Leftover cores go to the first slices.
+    """
+    index, _, count = share.partition("/")
+    if not index.isdigit() or not count.isdigit() or not 1 <= int(index) <= int(count):
+        raise ValueError(f"Invalid core share: {share}, expected K/N with 1 <= K <= N, e.g. 2/4")
+    index, count = int(index) - 1, int(count)
+    if count > len(cores):
+        raise ValueError(f"Cannot split {len(cores)} cores into {count} shares")
+
+    size, extra = divmod(len(cores), count)
+    start = index * size + min(index, extra)
+    return cores[start:start + size + (1 if index < extra else 0)]
+
+class ResourcePartition:
+    """
+    Cores and thread counts of one process, for running several main.py instances on one
+    host without oversubscribing the cores.
+
+    apply_environment() pins the process to the cores and sets the BLAS/OpenMP thread
+    variables; it has to run before numpy is imported. apply_libraries() sets the OpenCV
+    thread pool. The OpenVINO INFERENCE_NUM_THREADS and the torch intra-op threads are
+    passed to the HPE classes as num_threads/torch_threads (see main.py).
+    """
+
+    def __init__(self, cores, threads=None):
+        self.cores = list(cores)
+        self.threads = threads or len(self.cores)
+
+    @classmethod
+    def from_args(cls, cpus=None, cpu_share=None, threads=None):
+        """Returns None when no partitioning is requested."""
+        if cpus and cpu_share:
+            raise ValueError("Use either a core list or a core share, not both")
+        if cpus:
+            cores = parse_cpu_list(cpus)
+            unavailable = set(cores) - set(available_cores())
+            if unavailable:
+                raise ValueError(f"Cores {sorted(unavailable)} are not available to this process (available: {available_cores()})")
+            return cls(cores, threads)
+        if cpu_share:
+            return cls(share_of_cores(cpu_share, available_cores()), threads)
+        return None
+
+    def apply_environment(self):
+        if hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, self.cores)
+        else:
+            print("[WARNING] Pinning to cores is not supported on this platform, only thread counts are set")
+        for name in THREAD_ENV_VARS:
+            os.environ[name] = str(self.threads)
+
+    def apply_libraries(self):
+        import cv2
+        cv2.setNumThreads(self.threads)
+
+    def report(self):
+        import cv2
+        env = ", ".join(f"{name}={os.environ.get(name, 'unset')}" for name in THREAD_ENV_VARS)
+        print(f"[INFO] Resource partition: cores {format_cpu_list(available_cores())} ({len(available_cores())}), "
+              f"OpenCV threads={cv2.getNumThreads()}, {env}")
+
+def format_cpu_list(cores):
+    """Inverse of parse_cpu_list(): [0, 1, 2, 3, 8] -> "0-3,8"."""
+    ranges = []
+    for core in sorted(cores):
+        if ranges and core == ranges[-1][1] + 1:
+            ranges[-1][1] = core
+        else:
+            ranges.append([core, core])
+    return ",".join(f"{first}-{last}" if first != last else str(first) for first, last in ranges)
@@ -0,0 +1,114 @@
+import hashlib
+import json
+import os
+import pickle
+from collections import OrderedDict
+
+def file_fingerprint(*paths):
+    """Identifies model files by path, size and modification time, so a replaced model invalidates its entries."""
+    fingerprint = []
+    for path in paths:
+        path = os.path.abspath(str(path))
+        stat = os.stat(path) if os.path.exists(path) else None
+        fingerprint.append([path, stat.st_size, stat.st_mtime_ns] if stat else [path])
+    return fingerprint
+
+class ResultCache:
+    """
+    On-disk cache of model outputs (the result of run_model(), or the undecoded outputs of the
+    OpenVINO models; before any score threshold), so reruns over the same images skip inference.
+
+    Entries are keyed by a hash of the frame pixels and the settings that change the output
+    (method, model file, input size, precision, decoder options; see cache_settings() of the
+    HPE classes). Each entry is one pickle file under cache_dir. When the cache grows over
+    max_bytes the least recently used entries are removed; file modification times record
+    the last use, so the order is kept across runs.
+    """
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        # key -> size, least recently used first, loaded from the existing entries
+        found = []
+        for dirpath, _, filenames in os.walk(cache_dir):
+            for filename in filenames:
+                if filename.endswith(".pkl"):
+                    stat = os.stat(os.path.join(dirpath, filename))
+                    found.append((stat.st_mtime, filename[:-4], stat.st_size))
+        self.entries = OrderedDict((key, size) for _, key, size in sorted(found))
+        self.total_bytes = sum(self.entries.values())
+
+    @staticmethod
+    def key(frame, settings):
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(json.dumps(settings, sort_keys=True, default=str).encode())
+        digest.update(str(frame.shape).encode())
+        digest.update(frame.tobytes())
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ".pkl")
+
+    def get(self, key):
+        """Returns the cached value, or None on a miss."""
+        if key in self.entries:
+            path = self.path(key)
+            try:
+                with open(path, 'rb') as f:
+                    value = pickle.load(f)
+            except (OSError, EOFError, pickle.UnpicklingError):
+                # Removed or truncated by another run
+                self.remove(key)
+            else:
+                self.hits += 1
+                os.utime(path)
+                self.entries.move_to_end(key)
+                return value
+
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+        size = os.path.getsize(path)
+        self.total_bytes += size - self.entries.pop(key, 0)
+        self.entries[key] = size
+
+        while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            self.remove(next(iter(self.entries)))
+            self.evictions += 1
+
+    def remove(self, key):
+        size = self.entries.pop(key)
+        self.total_bytes -= size
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self.entries),
+            "bytes": self.total_bytes,
+        }
+
+    def summary(self):
+        lookups = self.hits + self.misses
+        hit_rate = 100 * self.hits / lookups if lookups else 0.0
+        return (f"Result cache: {self.hits} hits, {self.misses} misses ({hit_rate:.1f}% hit rate), {self.evictions} evictions, "
+                f"{len(self.entries)} entries, {self.total_bytes / 2**20:.1f}MB")
@@ -0,0 +1,63 @@
+import json
+
+# Regions are (x0, y0, x1, y1) in pixels of the full frame, x1/y1 exclusive
+
+def load_roi_config(path):
+    """
+    Reads the static regions from a json file, e.g.
+        {"roi": [0, 200, 1920, 1080], "exclude": [[1500, 0, 1920, 300]]}
+    "roi" restricts processing to one region, "exclude" masks regions out before inference.
+    Both are optional. Returns (roi or None, list of exclusion zones).
+    """
+    with open(path) as f:
+        config = json.load(f)
+
+    roi = config.get("roi")
+    if roi is not None:
+        roi = tuple(int(v) for v in roi)
+    exclude = [tuple(int(v) for v in zone) for zone in config.get("exclude", [])]
+    return roi, exclude
+
+def bodies_box(bodies):
+    """Union of the person boxes, or None when there are no people."""
+    if not bodies:
+        return None
+    return (min(b.xmin for b in bodies), min(b.ymin for b in bodies),
+            max(b.xmax for b in bodies), max(b.ymax for b in bodies))
+
+def expand_box(box, margin, bounds):
+    """Grows the box by `margin` times its size on every side, clipped to `bounds`."""
+    x0, y0, x1, y1 = box
+    mx, my = (x1 - x0) * margin, (y1 - y0) * margin
+    return clip_box((int(x0 - mx), int(y0 - my), int(x1 + mx + 1), int(y1 + my + 1)), bounds)
+
+def clip_box(box, bounds):
+    return (max(box[0], bounds[0]), max(box[1], bounds[1]), min(box[2], bounds[2]), min(box[3], bounds[3]))
+
+def is_valid_box(box):
+    return box[0] < box[2] and box[1] < box[3]
+
+def crop_region(frame, region, exclusion_zones):
+    """Returns the region of the frame with the exclusion zones blacked out (the frame itself is left untouched)."""
+    x0, y0, x1, y1 = region
+    crop = frame[y0:y1, x0:x1]
+
+    zones = [clip_box((zx0 - x0, zy0 - y0, zx1 - x0, zy1 - y0), (0, 0, x1 - x0, y1 - y0))
+             for zx0, zy0, zx1, zy1 in exclusion_zones]
+    zones = [z for z in zones if is_valid_box(z)]
+    if zones:
+        crop = crop.copy()
+        for zx0, zy0, zx1, zy1 in zones:
+            crop[zy0:zy1, zx0:zx1] = 0
+    return crop
+
+def offset_bodies(bodies, x0, y0, img_w, img_h):
+    """Maps bodies found in a crop starting at (x0, y0) back to coordinates of the img_w x img_h frame."""
+    for body in bodies:
+        body.xmin += x0
+        body.xmax += x0
+        body.ymin += y0
+        body.ymax += y0
+        body.keypoints = body.keypoints + [x0, y0]
+        body.keypoints_norm = body.keypoints / [img_w, img_h]
+    return bodies
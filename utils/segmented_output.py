@@ -0,0 +1,150 @@
+import csv
+import json
+import os
+
+from utils import export_pose_results
+
+MANIFEST_VERSION = 1
+
+class SegmentedOutput:
+    """
+    Writes the json/csv exports of a long run as a series of segments instead of one file
+    at exit. A segment is closed every `segment_frames` frames or `segment_minutes` minutes
+    (wall time of the frames), whichever comes first; its results are saved, the in-memory
+    results are reset, and the manifest is rewritten so finished segments can be read while
+    the run continues.
+
+    Manifest (`<prefix>_manifest.json`), one entry per segment:
+        {"index": 0, "first_frame": 0, "last_frame": 999,
+         "start_time": 1718000000.1, "end_time": 1718000040.0, "last_source": "img_0999.jpg",
+         "files": {"json": ..., "csv": ..., "tx": ..., "index": ...}}
+    Times are the unix timestamps also written to the csv. The per-segment index csv maps
+    every frame (including dropped ones) to its timestamp and source image, see read_window().
+
+    With resume=True the segments of an existing manifest up to `last_frame` are kept and
+    new segments are numbered after them (see utils/checkpoint.py).
+    """
+
+    def __init__(self, output_dir, prefix, enable_json, enable_csv, segment_frames=None, segment_minutes=None,
+                 resume=False, last_frame=None):
+        if not segment_frames and not segment_minutes:
+            raise ValueError("Segmented output needs segment_frames or segment_minutes")
+
+        self.output_dir = output_dir
+        self.prefix = prefix
+        self.json = enable_json
+        self.csv = enable_csv
+        self.segment_frames = segment_frames
+        self.segment_seconds = segment_minutes * 60 if segment_minutes else None
+
+        self.manifest_path = os.path.join(output_dir, f"{prefix}_manifest.json")
+        self.segments = []
+        self.frames = []   # (frame_number, timestamp, source) of the open segment
+
+        if resume and os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                segments = json.load(f)["segments"]
+            # A segment may have been closed after the last checkpoint was written
+            self.segments = [s for s in segments if last_frame is None or s["last_frame"] <= last_frame]
+
+    def add_frame(self, frame_number, timestamp, source=""):
+        """
+        Called before the results of a frame are appended; closes the segment first if it is full.
+        Returns the manifest entry of the closed segment, or None.
+        """
+        closed = None
+        if self.frames and self.is_full(timestamp):
+            closed = self.close_segment()
+        self.frames.append((frame_number, timestamp, source))
+        return closed
+
+    def is_full(self, timestamp):
+        if self.segment_frames and len(self.frames) >= self.segment_frames:
+            return True
+        return bool(self.segment_seconds) and timestamp - self.frames[0][1] >= self.segment_seconds
+
+    def close_segment(self):
+        index = len(self.segments)
+        base = f"{self.prefix}_seg{index:05d}"
+        files = {"index": f"{base}_index.csv"}
+
+        if self.json:
+            files["json"] = f"{base}_COCOformat.json"
+            export_pose_results.save_COCO_format_json(os.path.join(self.output_dir, files["json"]))
+        if self.csv:
+            files["csv"] = f"{base}_JSON.csv"
+            files["tx"] = f"{base}_Tx.csv"
+            export_pose_results.save_COCO_format_csv(os.path.join(self.output_dir, files["csv"]))
+            export_pose_results.save_Tx_csv_data(os.path.join(self.output_dir, files["tx"]))
+        export_pose_results.reset_results()
+
+        with open(os.path.join(self.output_dir, files["index"]), 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(["frame_number", "timestamp", "source"])
+            writer.writerows(self.frames)
+
+        self.segments.append({
+            "index": index,
+            "first_frame": self.frames[0][0],
+            "last_frame": self.frames[-1][0],
+            "start_time": self.frames[0][1],
+            "end_time": self.frames[-1][1],
+            "last_source": self.frames[-1][2],
+            "files": files,
+        })
+        self.frames = []
+        self.write_manifest()
+        return self.segments[-1]
+
+    def write_manifest(self):
+        # Written next to the old one and renamed, so readers never see a partial manifest
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({"version": MANIFEST_VERSION, "prefix": self.prefix, "segments": self.segments}, f, indent=1)
+        os.replace(tmp_path, self.manifest_path)
+
+    def close(self):
+        """Closes the open segment; returns its manifest entry, or None if it was empty."""
+        closed = self.close_segment() if self.frames else None
+        print(f"Saved {len(self.segments)} segments, manifest {self.manifest_path}")
+        return closed
+
+def read_window(manifest_path, first_frame=None, last_frame=None, start_time=None, end_time=None):
+    """
+    Loads the results of a frame range and/or time range (inclusive, None = open) from a
+    segmented run, reading only the segments that overlap the window.
+    Returns {"coco": [COCO entries], "rows": [JSON csv rows as dicts]}; either list is
+    empty when that export was not enabled.
+    """
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    segment_dir = os.path.dirname(manifest_path)
+
+    def in_range(value, low, high):
+        return (low is None or value >= low) and (high is None or value <= high)
+
+    coco, rows = [], []
+    for segment in manifest["segments"]:
+        if first_frame is not None and segment["last_frame"] < first_frame:
+            continue
+        if last_frame is not None and segment["first_frame"] > last_frame:
+            continue
+        if start_time is not None and segment["end_time"] < start_time:
+            continue
+        if end_time is not None and segment["start_time"] > end_time:
+            continue
+
+        files = segment["files"]
+        with open(os.path.join(segment_dir, files["index"]), newline='') as f:
+            frames = {int(row["frame_number"]) for row in csv.DictReader(f)
+                      if in_range(int(row["frame_number"]), first_frame, last_frame)
+                      and in_range(float(row["timestamp"]), start_time, end_time)}
+
+        if "json" in files:
+            with open(os.path.join(segment_dir, files["json"])) as f:
+                coco.extend(entry for entry in json.load(f) if entry["image_id"] in frames)
+        if "csv" in files:
+            with open(os.path.join(segment_dir, files["csv"]), newline='') as f:
+                rows.extend(row for row in csv.DictReader(f) if int(row["frame_number"]) in frames)
+
+    return {"coco": coco, "rows": rows}
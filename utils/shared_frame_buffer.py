@@ -0,0 +1,125 @@
+import os
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import queue
+
+import numpy as np
+
+# Sentinel slot index sent through the ready queue when the producer is done
+END_OF_STREAM = -1
+
+class SharedFrameRingBuffer:
+    """
+    Ring of fixed-size frame slots in shared memory, for moving frames between a
+    capture/decode process and an inference process without pickling them.
+
+    Only slot indices (and optional small per-frame info, e.g. a file name) travel
+    through the queues. The producer acquires a free slot, writes the frame into it
+    (or decodes straight into it with cap.read(view)) and commits it together with
+    its frame number and capture timestamp. The consumer reads the slot as a numpy
+    view on the shared block and releases it when done.
+
+    The object can be passed as an argument to multiprocessing.Process: the child
+    attaches to the same shared block by name.
+    """
+
+    def __init__(self, num_slots, frame_shape, dtype=np.uint8, ctx=None):
+        if num_slots < 1:
+            raise ValueError("num_slots must be at least 1")
+
+        self.num_slots = num_slots
+        self.frame_shape = tuple(frame_shape)
+        self.dtype = np.dtype(dtype)
+
+        self.frame_nbytes = int(np.prod(self.frame_shape)) * self.dtype.itemsize
+        # Keep the metadata region 8-byte aligned
+        self.frames_nbytes = (self.frame_nbytes * num_slots + 7) // 8 * 8
+        meta_nbytes = num_slots * 8 * 2  # int64 frame number + float64 timestamp
+
+        self.shm = shared_memory.SharedMemory(create=True, size=self.frames_nbytes + meta_nbytes)
+        self.owner_pid = os.getpid()  # only the creating process unlinks the block
+        self._map_arrays()
+
+        ctx = ctx or mp.get_context()
+        self.free_slots = ctx.Queue(maxsize=num_slots)
+        self.ready_slots = ctx.Queue(maxsize=num_slots + 1)  # +1 for the end-of-stream sentinel
+        for slot in range(num_slots):
+            self.free_slots.put(slot)
+
+    def _map_arrays(self):
+        buf = self.shm.buf
+        self.frames = np.ndarray((self.num_slots,) + self.frame_shape, dtype=self.dtype, buffer=buf)
+        self.frame_numbers = np.ndarray((self.num_slots,), dtype=np.int64, buffer=buf, offset=self.frames_nbytes)
+        self.timestamps = np.ndarray((self.num_slots,), dtype=np.float64, buffer=buf,
+                                     offset=self.frames_nbytes + self.num_slots * 8)
+
+    # Child processes attach to the existing block instead of creating a new one
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for key in ('shm', 'frames', 'frame_numbers', 'timestamps'):
+            del state[key]
+        state['shm_name'] = self.shm.name
+        return state
+
+    def __setstate__(self, state):
+        shm_name = state.pop('shm_name')
+        self.__dict__.update(state)
+        self.shm = shared_memory.SharedMemory(name=shm_name)
+        self._map_arrays()
+
+    # ---- producer side ----
+
+    def acquire(self, timeout=None):
+        """Returns (slot, view) of a free slot, or (None, None) if none is free within timeout."""
+        try:
+            slot = self.free_slots.get(timeout=timeout)
+        except queue.Empty:
+            return None, None
+        return slot, self.frames[slot]
+
+    def commit(self, slot, frame_number, timestamp, info=None):
+        self.frame_numbers[slot] = frame_number
+        self.timestamps[slot] = timestamp
+        self.ready_slots.put((slot, info))
+
+    def write(self, frame, frame_number, timestamp, timeout=None, info=None):
+        """Copies frame into a free slot and commits it. Returns the slot index, or None on timeout."""
+        if frame.shape != self.frame_shape:
+            raise ValueError(f"Frame shape {frame.shape} does not match slot shape {self.frame_shape}")
+
+        slot, view = self.acquire(timeout)
+        if slot is None:
+            return None
+        np.copyto(view, frame)
+        self.commit(slot, frame_number, timestamp, info)
+        return slot
+
+    def end_stream(self):
+        self.ready_slots.put((END_OF_STREAM, None))
+
+    # ---- consumer side ----
+
+    def read(self, timeout=None):
+        """
+        Returns (slot, frame_view, frame_number, timestamp, info) of the oldest committed slot.
+        Returns None at end of stream or on timeout. The view stays valid until release(slot).
+        """
+        try:
+            slot, info = self.ready_slots.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        if slot == END_OF_STREAM:
+            return None
+        return slot, self.frames[slot], int(self.frame_numbers[slot]), float(self.timestamps[slot]), info
+
+    def release(self, slot):
+        self.free_slots.put(slot)
+
+    # ---- cleanup ----
+
+    def close(self):
+        # Drop the numpy views first, SharedMemory.close() fails while buffers are exported
+        self.frames = self.frame_numbers = self.timestamps = None
+        self.shm.close()
+        if os.getpid() == self.owner_pid:
+            self.shm.unlink()
@@ -0,0 +1,7 @@
+import os
+
+# Memory-mappable weight caches are written by dev_tools/build_alphapose_weights_cache.py.
+# A cache is only used while it is newer than the file it was converted from
+def is_cache_valid(cache_path, source_path):
+    return os.path.exists(cache_path) and (not os.path.exists(source_path)
+                                           or os.path.getmtime(cache_path) >= os.path.getmtime(source_path))